@@ -0,0 +1,59 @@
+import os
+import json
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PAGES = os.path.join(FIXTURES, 'pages')
+# placeholder host used when no fixture server is running
+OFFLINE = 'http://fixtures.local'
+
+
+def load_stream(server=OFFLINE):
+    '''Load the recorded Feedly stream contents
+
+    :param str server: base url of the fixture server
+    :return list: Feedly stream contents
+    '''
+    with open(os.path.join(FIXTURES, 'stream.json'), 'r', encoding='utf-8') as f:
+        return json.loads(f.read().replace('{server}', server))
+
+
+def load_page(url):
+    '''Load the recorded page behind a fixture url
+
+    :param str url: fixture url
+    :return str: html string, None if not recorded
+    '''
+    path = os.path.join(PAGES, url.rsplit('/', 1)[-1].split('?')[0])
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class FixtureServer:
+    '''Serve the recorded pages on a local port (stand-in for the publishers)
+
+    with FixtureServer() as server:
+        stream = load_stream(server.url)
+
+    :attr str url: base url of the server
+    '''
+    def __enter__(self):
+        handler = partial(QuietHandler, directory=PAGES)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.url = 'http://127.0.0.1:%s'%self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,133 @@
+'''Memory of the article records, the html assembly and a whole run
+
+python -m bench.memory [-x <scale>] [-wk <wkhtmltopdf>]
+
+records   Python heap per parsed article, Articles (slots) next to the same
+          fields on a plain object with a __dict__
+assembly  peak heap and time of parse_bs_page on a long article
+pipeline  peak heap of main.main on the scaled fixture stream, for a few
+          queue depths (needs wkhtmltopdf, the html and epub renderers
+          hold every article until the end)
+'''
+import os
+import sys
+import time
+import shutil
+import argparse
+import contextlib
+import tempfile
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+import main as cli
+from scripts.articles import ForbesArticles
+from scripts.fetcher import FETCHER
+from bench.common import FixtureServer, load_stream
+from bench.renderers import load_articles
+from bench.replay import ReplayRSS, scaled
+
+# queue depths of the pipeline run
+DEPTHS = [10, 100, 1000]
+
+
+class DictRecord:
+    '''The fields of Articles on a plain object, for comparison'''
+    def __init__(self, d):
+        for k, v in d.items():
+            setattr(self, k, v)
+
+
+def traced(func, *args, **kwargs):
+    '''Run a function under tracemalloc
+
+    :return tuple: (result, heap held after the call in bytes, peak in bytes, seconds)
+    '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, seconds
+
+
+def records(scale):
+    '''Heap per record, the strings are shared and not counted
+
+    :param int scale: copies of the fixture articles
+    '''
+    article_list = load_articles(scale)
+    dicts = [a.to_dict() for a in article_list]
+    size = sum(len(a.content) for a in article_list) / len(article_list)
+    print('%s articles, %.1fKB of content each'%(len(article_list), size / 1024))
+    for name, build in [('Articles', lambda d: type(article_list[0]).from_dict(d)),
+                        ('__dict__', DictRecord)]:
+        objs, current, _, _ = traced(lambda: [build(d) for d in dicts])
+        print('%-10s %8.0f bytes/record'%(name, current / len(objs)))
+
+
+def assembly(paragraphs):
+    '''Peak heap of parse_bs_page against the size of its output
+
+    :param int paragraphs: paragraphs of the article
+    '''
+    body = ''.join('<p>Paragraph %s of a long article, with some text.</p>\n'
+                   '<h2>Heading %s</h2><ul><li>item</li></ul>'%(k, k) for k in range(paragraphs))
+    article_bs = BeautifulSoup('<div>%s</div>'%body, 'lxml')
+    article = ForbesArticles()
+    article.title, article.origin, article.published = 'Title', 'Origin', '2020-01-01'
+    content, _, peak, seconds = traced(article.parse_bs_page, article_bs)
+    print('%s paragraphs, %.0fKB of html: peak %.0fKB (%.1fx), %.0fms'
+          %(paragraphs, len(content) / 1024, peak / 1024, peak / len(content), seconds*1000))
+
+
+def pipeline(scale, wkhtmltopdf):
+    '''Peak heap of a whole run for a few queue depths
+
+    :param int scale: copies of the fixture stream
+    :param str wkhtmltopdf: path of wkhtmltopdf
+    '''
+    FETCHER.cache = None
+    tmp = tempfile.mkdtemp(prefix='feedly2pdf_bench_')
+    cwd = os.getcwd()
+    try:
+        # main.main writes its log next to the working directory
+        os.chdir(tmp)
+        with FixtureServer() as server:
+            stream = scaled(load_stream(server.url), scale)
+            print('%s entries'%len(stream))
+            for depth in DEPTHS:
+                FETCHER.pages.clear()
+                with contextlib.redirect_stdout(None):
+                    _, _, peak, seconds = traced(
+                        cli.main, None, 'bench', wkhtmltopdf, os.path.join(tmp, 'out.pdf'),
+                        cache_dir='None', store_dir='None', feedly_api=ReplayRSS(stream),
+                        dedup=False, depth=depth)
+                print('depth %-6s peak %8.0fKB %8.2fs'%(depth, peak / 1024, seconds))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main(scale, wkhtmltopdf):
+    print('records')
+    records(scale)
+    print('\nassembly')
+    for paragraphs in (100, 1000, 10000):
+        assembly(paragraphs)
+    print('\npipeline')
+    if wkhtmltopdf and os.path.exists(wkhtmltopdf):
+        pipeline(scale, wkhtmltopdf)
+    else:
+        print('skipped (wkhtmltopdf not found)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-x', '--scale', default=20, type=int, dest='scale',
+                        metavar='<scale>', help='copies of the fixture articles')
+    parser.add_argument('-wk', '--wkhtmltopdf', default=shutil.which('wkhtmltopdf'), dest='wk',
+                        metavar='<wkhtmltopdf>', help='path of wkhtmltopdf')
+    args = parser.parse_args()
+    sys.exit(main(args.scale, args.wk))
@@ -0,0 +1,58 @@
+'''Compare the html parsing backends of articles.py on the fixture pages
+
+python -m bench.parsers [-n <repeat>]
+'''
+import sys
+import time
+import argparse
+
+from scripts import articles
+from scripts.articles import article_factory
+from scripts.fetcher import FETCHER
+from bench.common import load_stream, load_page
+
+BACKENDS = ['bs4', 'strainer']
+
+
+def run(article_json, backend):
+    '''Parse one fixture entry with a backend
+
+    :param dict article_json: Feedly stream contents
+    :param str backend: value of articles.PARSER
+    :return tuple: (content, seconds)
+    '''
+    articles.PARSER = backend
+    article_cls, _ = article_factory(article_json)
+    url = article_cls.page_url(article_json)
+    if url is not None:
+        FETCHER.pages[url] = load_page(url)
+    start = time.perf_counter()
+    article_obj = article_cls()
+    article_obj.get_content(article_json)
+    return article_obj.content, time.perf_counter() - start
+
+
+def main(repeat):
+    mismatch = 0
+    print('%-45s %10s %10s  %s'%('source', *BACKENDS, 'output'))
+    for article_json in load_stream():
+        times = {}
+        contents = {}
+        for backend in BACKENDS:
+            best = None
+            for _ in range(repeat):
+                contents[backend], t = run(article_json, backend)
+                best = t if best is None else min(best, t)
+            times[backend] = best
+        same = len(set(contents.values())) == 1
+        mismatch += not same
+        print('%-45s %8.2fms %8.2fms  %s'%(article_json['origin']['title'][:45],
+              times['bs4']*1000, times['strainer']*1000, 'same' if same else 'DIFFERENT'))
+    return mismatch
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--repeat', default=5, type=int, dest='repeat',
+                        metavar='<repeat>', help='runs per backend, best is kept')
+    sys.exit(1 if main(parser.parse_args().repeat) else 0)
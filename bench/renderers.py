@@ -0,0 +1,109 @@
+'''Compare the output backends of the Converter on the fixture articles
+
+python -m bench.renderers [-x <scale>] [-wk <wkhtmltopdf>]
+
+Backends that are not available here (no wkhtmltopdf binary, WeasyPrint
+not installed) are skipped. The peak is the Python heap (tracemalloc);
+wkhtmltopdf runs in child processes, their max RSS is shown apart.
+'''
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import importlib.util
+
+from scripts.articles import article_factory
+from scripts.converter import Converter
+from scripts.defaults import EXTENSIONS
+from scripts.fetcher import FETCHER
+from bench.common import load_stream, load_page
+from bench.replay import scaled
+
+# max RSS of child processes, not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def load_articles(scale):
+    '''Parse the fixture entries offline
+
+    :param int scale: copies of the stream
+    :return list: list of Article classes
+    '''
+    article_list = []
+    for article_json in scaled(load_stream(), scale):
+        article_cls, ori = article_factory(article_json)
+        url = article_cls.page_url(article_json)
+        if url is not None:
+            FETCHER.pages[url] = load_page(url)
+        article_obj = article_cls()
+        article_obj.source = ori
+        article_obj.get_content(article_json)
+        article_list.append(article_obj)
+    return article_list
+
+
+def available(renderer, wkhtmltopdf):
+    '''Whether a backend can run here
+
+    :param str renderer: key of EXTENSIONS
+    :param str wkhtmltopdf: path of wkhtmltopdf
+    :return bool
+    '''
+    if renderer == 'wkhtmltopdf':
+        return bool(wkhtmltopdf) and os.path.exists(wkhtmltopdf)
+    if renderer == 'weasyprint':
+        return importlib.util.find_spec('weasyprint') is not None
+    return True
+
+
+def run(article_list, renderer, wkhtmltopdf, by_source, tmp):
+    '''Render the articles with one backend
+
+    :return tuple: (seconds, Python heap peak in KB, output size in KB)
+    '''
+    out = os.path.join(tmp, 'out' + EXTENSIONS[renderer])
+    cvt = Converter(wkhtmltopdf, out, by_source=by_source, renderer=renderer)
+    tracemalloc.start()
+    start = time.perf_counter()
+    cvt.string_to_pdf(article_list)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024, os.path.getsize(out) / 1024
+
+
+def main(scale, wkhtmltopdf, by_source):
+    article_list = load_articles(scale)
+    print('%s articles%s'%(len(article_list), ', by source' if by_source else ''))
+    print('%-12s %10s %10s %10s'%('renderer', 'time', 'peak', 'size'))
+    tmp = tempfile.mkdtemp(prefix='feedly2pdf_bench_')
+    try:
+        for renderer in EXTENSIONS:
+            if not available(renderer, wkhtmltopdf):
+                print('%-12s skipped (not available)'%renderer)
+                continue
+            seconds, peak, size = run(article_list, renderer, wkhtmltopdf, by_source, tmp)
+            print('%-12s %9.2fs %8.0fKB %8.0fKB'%(renderer, seconds, peak, size))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    if resource is not None and available('wkhtmltopdf', wkhtmltopdf):
+        rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        print('wkhtmltopdf max RSS %.0fMB'%(rss / 1024))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-x', '--scale', default=5, type=int, dest='scale',
+                        metavar='<scale>', help='copies of the fixture articles')
+    parser.add_argument('-wk', '--wkhtmltopdf', default=shutil.which('wkhtmltopdf'), dest='wk',
+                        metavar='<wkhtmltopdf>', help='path of wkhtmltopdf')
+    parser.add_argument('--by-source', action='store_true', dest='by_source',
+                        help='one section per source')
+    args = parser.parse_args()
+    sys.exit(main(args.scale, args.wk, args.by_source))
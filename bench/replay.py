@@ -0,0 +1,180 @@
+'''Replay the recorded Feedly stream through the scraping and rendering stages
+
+The publisher pages are served by a local fixture server, so the numbers
+only depend on this code (and wkhtmltopdf), not on the network. The stages
+are timed one after the other, then overlapped as main.main runs them.
+
+python -m bench.replay [-n <repeat>] [-x <scale>] [-j <jobs>] [-wk <wkhtmltopdf>]
+'''
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.articles import article_factory
+from scripts.converter import Converter
+from scripts.fetcher import FETCHER
+from scripts.feedly_rss import PAGE_SIZE
+from bench.common import FixtureServer, load_stream, load_page
+import main as cli
+from main import scrape, prefetch
+
+
+def parse_stats(stream, repeat):
+    '''Time and trace every parser on its fixture entry
+
+    The recorded page is handed to the parser through FETCHER.pages before
+    every run, so only the parsing is timed, not the fetch.
+
+    :param list stream: Feedly stream contents
+    :param int repeat: runs per parser, best time is kept
+    :return list: [(class name, seconds, peak KB)]
+    '''
+    stats = []
+    for article_json in stream:
+        article_cls, _ = article_factory(article_json)
+        url = article_cls.page_url(article_json)
+        html = load_page(url) if url is not None else None
+        best = None
+        for _ in range(repeat):
+            if html is not None:
+                FETCHER.pages[url] = html
+            start = time.perf_counter()
+            article_cls().get_content(article_json)
+            t = time.perf_counter() - start
+            best = t if best is None else min(best, t)
+        if html is not None:
+            FETCHER.pages[url] = html
+        tracemalloc.start()
+        article_cls().get_content(article_json)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        FETCHER.pages.pop(url, None)
+        stats.append((article_cls.__name__, best, peak / 1024))
+    return stats
+
+
+def end_to_end(stream, jobs, wkhtmltopdf):
+    '''Run the main.py stages on the whole stream
+
+    :param list stream: Feedly stream contents
+    :param int jobs: scraping workers
+    :param str wkhtmltopdf: path of wkhtmltopdf, None to skip rendering
+    :return dict: seconds per stage
+    '''
+    times = {}
+    start = time.perf_counter()
+    prefetch(stream)
+    times['prefetch'] = time.perf_counter() - start
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        article_list = [a for a, _, _ in pool.map(scrape, stream) if a is not None]
+    times['scrape'] = time.perf_counter() - start
+    if wkhtmltopdf:
+        tmp = tempfile.mkdtemp(prefix='feedly2pdf_bench_')
+        try:
+            start = time.perf_counter()
+            Converter(wkhtmltopdf, os.path.join(tmp, 'out.pdf')).string_to_pdf(article_list)
+            times['render'] = time.perf_counter() - start
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    times['articles'] = len(article_list)
+    return times
+
+
+class ReplayRSS:
+    '''Stand-in for FeedlyRSS, serves the stream in Feedly sized pages
+
+    :attr list stream: Feedly stream contents
+    '''
+    def __init__(self, stream):
+        self.stream = stream
+
+    def refresh(self):
+        pass
+
+    def iter_pages(self, categories, newer_than=None):
+        for category in categories:
+            for i in range(0, len(self.stream), PAGE_SIZE):
+                yield category, self.stream[i:i + PAGE_SIZE]
+
+
+def pipelined(stream, jobs, wkhtmltopdf):
+    '''Run main.main on the whole stream, stages overlapped
+
+    :param list stream: Feedly stream contents
+    :param int jobs: scraping workers
+    :param str wkhtmltopdf: path of wkhtmltopdf
+    :return float: seconds
+    '''
+    tmp = tempfile.mkdtemp(prefix='feedly2pdf_bench_')
+    cwd = os.getcwd()
+    try:
+        # main.main writes its log next to the working directory
+        os.chdir(tmp)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            cli.main(None, 'bench', wkhtmltopdf, os.path.join(tmp, 'out.pdf'), jobs=jobs,
+                     cache_dir='None', store_dir='None', feedly_api=ReplayRSS(stream),
+                     dedup=False)
+        return time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def scaled(stream, scale):
+    '''Repeat the stream with distinct entry ids
+
+    :param list stream: Feedly stream contents
+    :param int scale: number of copies
+    :return list: Feedly stream contents
+    '''
+    out = []
+    for k in range(scale):
+        for article_json in stream:
+            article_json = dict(article_json)
+            article_json['id'] = '%s/%s'%(article_json['id'], k)
+            out.append(article_json)
+    return out
+
+
+def main(repeat, scale, jobs, wkhtmltopdf):
+    FETCHER.cache = None
+    with FixtureServer() as server:
+        stream = load_stream(server.url)
+        print('%-20s %10s %10s'%('parser', 'time', 'peak'))
+        for name, t, peak in parse_stats(stream, repeat):
+            print('%-20s %8.2fms %8.0fKB'%(name, t*1000, peak))
+        stream = scaled(stream, scale)
+        times = end_to_end(stream, jobs, wkhtmltopdf)
+        if wkhtmltopdf:
+            FETCHER.pages.clear()
+            times['pipelined'] = pipelined(stream, jobs, wkhtmltopdf)
+    print()
+    print('%s entries, %s jobs'%(len(stream), jobs))
+    print('prefetch %.2fs, prefetch + scrape %.2fs (%.1f articles/s)'
+          %(times['prefetch'], times['scrape'], times['articles'] / times['scrape']))
+    if 'render' in times:
+        print('render %.2fs (%.1f articles/s)'%(times['render'], times['articles'] / times['render']))
+        print('pipelined %.2fs, stages one after the other %.2fs'
+              %(times['pipelined'], times['scrape'] + times['render']))
+    else:
+        print('render skipped (wkhtmltopdf not found)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--repeat', default=5, type=int, dest='repeat',
+                        metavar='<repeat>', help='runs per parser, best is kept')
+    parser.add_argument('-x', '--scale', default=5, type=int, dest='scale',
+                        metavar='<scale>', help='copies of the stream for the end-to-end run')
+    parser.add_argument('-j', '--jobs', default=8, type=int, dest='jobs',
+                        metavar='<jobs>', help='scraping workers')
+    parser.add_argument('-wk', '--wkhtmltopdf', default=shutil.which('wkhtmltopdf'), dest='wk',
+                        metavar='<wkhtmltopdf>', help='path of wkhtmltopdf')
+    args = parser.parse_args()
+    main(args.repeat, args.scale, args.jobs, args.wk)
@@ -0,0 +1,65 @@
+'''Measure the cold start of the command line
+
+python -m bench.startup [-n <repeat>]
+
+Every command runs in a fresh interpreter. Exits with 1 if importing
+main loads one of the heavy modules.
+'''
+import os
+import sys
+import time
+import argparse
+import subprocess
+from statistics import median
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# third-party modules only the stages should load
+HEAVY = ['feedly', 'requests', 'httpx', 'bs4', 'lxml', 'pdfkit', 'pypdf']
+COMMANDS = [
+    ('python', ['-c', 'pass']),
+    ('main.py -h', ['main.py', '-h']),
+    ('import main', ['-c', 'import main']),
+    ('import all stages', ['-c', 'import main, scripts.articles, scripts.converter, '
+                                 'scripts.feedly_rss, scripts.store, scripts.images']),
+]
+
+
+def cold_start(args, repeat):
+    '''Time a command in fresh interpreters
+
+    :param list args: arguments of the python interpreter
+    :param int repeat: runs, the median is kept
+    :return float: seconds
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return median(times)
+
+
+def heavy_imports():
+    '''Heavy modules loaded by importing main
+
+    :return list: module names
+    '''
+    code = 'import sys, main; print(" ".join(m for m in %r if m in sys.modules))'%HEAVY
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                         text=True, check=True)
+    return out.stdout.split()
+
+
+def main(repeat):
+    for name, args in COMMANDS:
+        print('%-20s %8.1fms'%(name, cold_start(args, repeat)*1000))
+    loaded = heavy_imports()
+    print('heavy modules loaded by import main: %s'%(', '.join(loaded) or 'none'))
+    return len(loaded)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--repeat', default=10, type=int, dest='repeat',
+                        metavar='<repeat>', help='runs per command, the median is kept')
+    sys.exit(1 if main(parser.parse_args().repeat) else 0)
@@ -1,12 +1,20 @@
 import os
 import sys
+import time
 import argparse
+import threading
+import importlib.util
+from queue import Queue, Full
 from datetime import datetime
 
+# only light modules here, the stages import feedly, requests, bs4, lxml
+# and pdfkit when they run, so -h and argument errors return at once
 from scripts.category import *
-from scripts.feedly_rss import *
-from scripts.articles import *
-from scripts.converter import *
+from scripts.defaults import (MAX_PER_HOST, BATCH_SIZE, WORKERS, MAX_WIDTH, RENDERER, EXTENSIONS,
+                             WINDOW)
+from scripts.cache import TTL
+from scripts.metrics import METRICS
+from scripts.service import PORT, EVERY
 
 PATH = sys.path[0]
 
@@ -16,40 +24,515 @@ TOKEN = os.path.join(PATH, 'src', 'access.token')
 WK = os.path.join(PATH, 'src', 'wkhtmltopdf.exe')
 # path of css file
 STYLE = os.path.join(PATH, 'src', 'style.css')
+# path of http cache, 'None' to disable
+CACHE = os.path.join(PATH, 'cache', 'http')
+# path of the index of rendered entries
+SEEN = os.path.join(PATH, 'cache', 'seen.db')
+# path of parsed article store, 'None' to disable
+STORE = os.path.join(PATH, 'cache', 'fragments')
+# path of downloaded images
+IMAGES = os.path.join(PATH, 'cache', 'images')
+# number of concurrent scraping workers
+JOBS = 8
+# entries read from Feedly ahead of the renderer
+DEPTH = 100
 
-def main(token_file, category, wkhtmltopdf, out='out', css=None):
+def scrape(article_json, store=None):
+    '''Fetch and parse one Feedly entry
+
+    :param dict article_json: Feedly stream contents
+    :param FragmentStore store: parsed article store, reused and filled if given
+    :return tuple: (Articles or None, log, elapsed seconds)
+    '''
+    from scripts.articles import article_factory
+    from scripts.fetcher import FetchError
+
+    start = time.perf_counter()
+    article_cls, ori = article_factory(article_json)
+    if store is not None:
+        article_obj = store.load(article_json['id'])
+        if article_obj is not None:
+            elapsed = time.perf_counter() - start
+            METRICS.inc('stored', origin=ori)
+            return article_obj, 'from %s stored (%.2fs).'%(ori, elapsed), elapsed
+    url = ''
+    if 'originId' in article_json.keys():
+        url = article_json['originId']
+    if 'canonicalUrl' in article_json.keys():
+        url = article_json['canonicalUrl']
+    article_obj = None
+    log = 'from %s '%ori
+    status = 'done'
+    try:
+        article_obj = article_cls()
+        article_obj.entry_id = article_json['id']
+        article_obj.source = ori
+        article_obj.get_content(article_json)
+        if store is not None:
+            store.save(article_obj)
+        log = log + 'done'
+    except AttributeError:
+        article_obj = None
+        status = 'NoAttribute'
+    except TypeError:
+        article_obj = None
+        status = 'NoType'
+    except KeyError:
+        article_obj = None
+        status = 'NoKey'
+    except FetchError as e:
+        article_obj = None
+        status = e.__class__.__name__
+    if article_obj is None:
+        log = log + 'failed (%s)'%status
+        METRICS.inc('failed_%s'%status, origin=ori)
+    else:
+        METRICS.inc('done', origin=ori)
+    elapsed = time.perf_counter() - start
+    METRICS.observe('scrape', elapsed, ori)
+    log = log + ' (%.2fs).'%elapsed
+    if article_obj is None:
+        log = log + '\n  ' + url
+    return article_obj, log, elapsed
+
+
+def prefetch(article_json_list, store=None, wait=True):
+    '''Download publisher pages concurrently before parsing
+
+    :param list article_json_list: Feedly stream contents
+    :param FragmentStore store: entries already in the store are not fetched
+    :param bool wait: block until done, else prefetch in the background
+    '''
+    from scripts.articles import article_factory, POLICY_DICT
+    from scripts.fetcher import FETCHER, DEFAULT_POLICY
+
+    urls = []
+    for article_json in article_json_list:
+        if store is not None and store.load(article_json['id']) is not None:
+            continue
+        try:
+            article_cls, ori = article_factory(article_json)
+            url = article_cls.prefetch_url(article_json)
+            if url is not None:
+                FETCHER.set_policy(url, POLICY_DICT.get(ori, DEFAULT_POLICY))
+            urls.append(url)
+        except (KeyError, AttributeError):
+            continue
+    FETCHER.prefetch(urls, wait)
+
+
+def converter(wkhtmltopdf, out, css, batch_size, render_jobs, by_source, inline_images,
+              image_width, renderer=RENDERER):
+    '''Converter of one output file, downloading the images of each batch first if asked
+
+    :return Converter
+    '''
+    from scripts.converter import Converter
+
+    if not inline_images:
+        return Converter(wkhtmltopdf, out, css, batch_size, render_jobs, by_source, False,
+                         renderer)
+    from scripts.images import ImageCache
+
+    images = ImageCache(IMAGES, image_width)
+
+    def prepare(article_list):
+        start = time.perf_counter()
+        n_local, n_failed = images.inline(article_list)
+        print('%s images downloaded, %s failed (%.2fs).'
+              %(n_local, n_failed, time.perf_counter() - start))
+    return Converter(wkhtmltopdf, out, css, batch_size, render_jobs, by_source, True,
+                     renderer, prepare)
+
+
+def render(article_list, wkhtmltopdf, out, css, batch_size, render_jobs, by_source,
+           inline_images, image_width, renderer=RENDERER):
+    '''Render articles to pdf, downloading their images first if asked
+
+    :param list article_list: list of Article classes
+    '''
+    cvt = converter(wkhtmltopdf, out, css, batch_size, render_jobs, by_source, inline_images,
+                    image_width, renderer)
+    with METRICS.timer('render'):
+        cvt.string_to_pdf(article_list)
+
+
+def report(metrics, start):
+    '''Print the stage totals and write the metrics report of a run
+
+    :param str metrics: path of the report, None to only print
+    :param Metrics start: copy of METRICS taken when the run started
+    '''
+    run_metrics = METRICS.since(start)
+    print(run_metrics.summary())
+    if metrics is not None:
+        run_metrics.write(metrics)
+
+
+def main(token_file, category, wkhtmltopdf, out='out', css=None, jobs=JOBS,
+         per_host=MAX_PER_HOST, cache_dir=CACHE, cache_ttl=TTL,
+         incremental=False, since_last_run=False, store_dir=STORE, render_only=False,
+         batch_size=BATCH_SIZE, render_jobs=WORKERS, by_source=False,
+         inline_images=False, image_width=MAX_WIDTH, metrics=None, http2=False,
+         feedly_api=None, renderer=RENDERER, dedup=True, depth=DEPTH, retry_failed=False):
+    '''Build the pdf of one category, or of several in one batch
+
+    In a batch, category and out are lists of the same length. All streams
+    are read over one Feedly session and an entry found in several
+    categories is scraped once. With dedup, entries that are the same story
+    (same url, DOI or near-identical title) are collapsed into the first
+    one before anything is fetched. A long-lived FeedlyRSS can be passed as
+    feedly_api (service mode), otherwise the token file is read.
+
+    The stages overlap: Feedly is read on its own thread, each new entry is
+    scraped as soon as its page arrives and the articles are rendered in
+    Feedly order while later ones are still scraped, batch by batch. At most
+    depth entries wait between the Feedly reader and the renderer, so a slow
+    renderer holds back the reading instead of filling the memory.
+
+    With retry_failed, a category with entries that failed to scrape or
+    render is not recorded in the seen index at all, the next run builds
+    it whole again (backfill windows).
+    '''
+    from concurrent.futures import ThreadPoolExecutor
+    from scripts.feedly_rss import FeedlyRSS
+    from scripts.fetcher import FETCHER
+    from scripts.cache import HttpCache
+    from scripts.seen import SeenIndex
+    from scripts.store import FragmentStore
+    from scripts.dedup import Deduper
+
+    # METRICS holds every run of the process, the report only this one
+    metrics_start = METRICS.copy()
+    if isinstance(category, str):
+        category, out = [category], [out]
     if css == 'None': css = None
-    if '.pdf' not in out: out += '.pdf'
-    article_list = []
-    feedly_api = FeedlyRSS(token_file)
-    feedly_api.get_rss(category)
-    count = 0
-    log_all = ''
-    for article_json in feedly_api.article_json_list:
-        count += 1
-        article_cls, ori = article_factory(article_json)
-        if 'originId' in article_json.keys():
-            url = article_json['originId']
-        if 'canonicalUrl' in article_json.keys():
-            url = article_json['canonicalUrl']
-        log = 'Article %s from %s '%(count, ori)
+    out = [output_path(o, renderer) for o in out]
+    store = None
+    if store_dir != 'None':
+        store = FragmentStore(store_dir)
+    if render_only:
+        if store is None:
+            print('--render-only needs the article store.')
+            return
+        for cat, cat_out in zip(category, out):
+            article_list = [store.load(i) for i in store.load_manifest(cat)]
+            article_list = [a for a in article_list if a is not None]
+            print('%s articles loaded from store.'%len(article_list))
+            render(article_list, wkhtmltopdf, cat_out, css, batch_size, render_jobs, by_source,
+                   inline_images, image_width, renderer)
+        report(metrics, metrics_start)
+        return
+    if cache_dir != 'None':
+        FETCHER.cache = HttpCache(cache_dir, cache_ttl)
+    FETCHER.http2 = http2
+    run_start = datetime.now().timestamp() * 1000
+    seen = None
+    if incremental or since_last_run:
+        seen = SeenIndex(SEEN)
+    if feedly_api is None:
+        feedly_api = FeedlyRSS(token_file)
+    else:
+        feedly_api.refresh()
+    newer_than = {}
+    if since_last_run:
+        newer_than = {cat: seen.last_run(cat) for cat in category}
+    skip = {}
+    if incremental:
+        skip = {cat: seen.seen_ids(cat) for cat in category}
+    deduper = Deduper() if dedup else None
+    # ids of the collapsed duplicates, marked as seen with the kept entry
+    collapsed = {cat: [] for cat in category}
+    listed = {cat: set() for cat in category}
+    dup_log = []
+    skipped = 0
+    # entry id: [scrape future, categories yet to render it], an entry in
+    # several categories is scraped once: a rendered entry is kept while a
+    # later category may still list it, i.e. until Feedly is read, except
+    # in the last category
+    unique = {}
+    scraped_ids = set()
+    scrapes = []
+    done_at = []
+    read_done = []
+    lock = threading.Lock()
+    # (category, entry id) in Feedly order, (category, None) once a category
+    # is read and None at the end; reading Feedly waits while it is full
+    pipe = Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pipe.put(item, timeout=1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def read(pool):
+        '''Read the Feedly streams, start scraping each new entry and queue it'''
+        nonlocal skipped
         try:
-            article_obj = article_cls()
-            article_obj.get_content(article_json)
-            article_list.append(article_obj)
-            log = log + 'done.'
-        except AttributeError:
-            log = log + 'failed (NoAttribute).\n  ' + url
-        except TypeError:
-            log = log + 'failed (NoType).\n  ' + url
-        except KeyError:
-            log = log + 'failed (NoKey).\n  ' + url
+            read_cats = []
+            feedly_start = time.perf_counter()
+            for cat, page in feedly_api.iter_pages(category, newer_than):
+                METRICS.observe('feedly', time.perf_counter() - feedly_start)
+                if not read_cats or read_cats[-1] != cat:
+                    if read_cats and not put((read_cats[-1], None)):
+                        return
+                    read_cats.append(cat)
+                entries = []
+                for article_json in page:
+                    if article_json['id'] in skip.get(cat, ()):
+                        skipped += 1
+                        # later copies of a rendered story are duplicates too
+                        if deduper is not None:
+                            deduper.add(article_json)
+                        continue
+                    dup = deduper.add(article_json) if deduper is not None else None
+                    if dup is not None:
+                        kept, reason = dup
+                        collapsed[cat].append(article_json['id'])
+                        dup_log.append('Duplicate in %s: %s (%s)\n  of %s (%s), same %s.\n'
+                                       %(cat, article_json.get('title'),
+                                         article_json['origin']['title'],
+                                         kept.get('title'), kept['origin']['title'], reason))
+                        if kept['id'] in skip.get(cat, ()) or kept['id'] in listed[cat]:
+                            continue
+                        article_json = kept
+                    entries.append(article_json)
+                    listed[cat].add(article_json['id'])
+                new = []
+                with lock:
+                    for article_json in entries:
+                        if article_json['id'] not in unique:
+                            unique[article_json['id']] = [None, 0]
+                            new.append(article_json)
+                        unique[article_json['id']][1] += 1
+                prefetch(new, store, wait=False)
+                for article_json in new:
+                    future = pool.submit(scrape, article_json, store)
+                    future.add_done_callback(lambda f: done_at.append(time.perf_counter()))
+                    scraped_ids.add(article_json['id'])
+                    scrapes.append(article_json['id'])
+                    with lock:
+                        unique[article_json['id']][0] = future
+                for article_json in entries:
+                    if not put((cat, article_json['id'])):
+                        return
+                feedly_start = time.perf_counter()
+            for cat in read_cats[-1:] + [c for c in category if c not in read_cats]:
+                if not put((cat, None)):
+                    return
+        finally:
+            with lock:
+                read_done.append(True)
+                for entry_id in [i for i, entry in unique.items() if entry[1] == 0]:
+                    del unique[entry_id]
+            put(None)
+
+    # categories are rendered while the next entries are scraped and read,
+    # the articles come out of the queue in Feedly order
+    cvts = {}
+    ids = {cat: [] for cat in category}
+    # entry ids that failed to scrape or render
+    failed = {cat: [] for cat in category}
+    logs = {cat: [] for cat in category}
+    render_time = {cat: 0 for cat in category}
+
+    def checkpoint(cat, entry_ids):
+        '''Record the entries of a category as rendered and its last run'''
+        if retry_failed and failed[cat]:
+            print('%s articles failed in %s, built again on the next run.'%(len(failed[cat]), cat))
+            return
+        seen.mark(cat, entry_ids)
+        seen.set_last_run(cat, run_start)
+
+    def finish(cat):
+        '''Write the output of a category once all its entries are rendered'''
+        cvt = cvts.pop(cat, None)
+        if seen is not None and not ids[cat]:
+            print('No new articles in %s.'%cat)
+            if cvt is not None:
+                cvt.close()
+            checkpoint(cat, collapsed[cat])
+            return
+        if store is not None:
+            store.save_manifest(cat, ids[cat])
+        if cvt is None:
+            cvt = converter(wkhtmltopdf, out[category.index(cat)], css, batch_size, render_jobs,
+                            by_source, inline_images, image_width, renderer)
+        t = time.perf_counter()
+        unrendered = set(cvt.end())
+        METRICS.observe('render', render_time[cat] + time.perf_counter() - t)
+        # articles of failed batches are not in the output, they are not seen
+        failed[cat].extend(unrendered)
+        if seen is not None:
+            checkpoint(cat, [i for i in ids[cat] if i not in unrendered] + collapsed[cat])
+
+    start = time.perf_counter()
+    FETCHER.max_per_host = per_host
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool, \
+            ThreadPoolExecutor(max_workers=1) as feedly_pool:
+        reader = feedly_pool.submit(read, pool)
+        try:
+            for cat, entry_id in iter(pipe.get, None):
+                if entry_id is None:
+                    finish(cat)
+                    continue
+                with lock:
+                    entry = unique[entry_id]
+                article_obj, log, _ = entry[0].result()
+                with lock:
+                    entry[1] -= 1
+                    if entry[1] == 0 and (read_done or cat == category[-1]):
+                        del unique[entry_id]
+                logs[cat].append('Article %s %s\n'%(len(logs[cat]) + 1, log))
+                print(logs[cat][-1], end='')
+                if article_obj is None:
+                    failed[cat].append(entry_id)
+                    continue
+                ids[cat].append(article_obj.entry_id)
+                if cat not in cvts:
+                    cvts[cat] = converter(wkhtmltopdf, out[category.index(cat)], css, batch_size,
+                                          render_jobs, by_source, inline_images, image_width,
+                                          renderer)
+                t = time.perf_counter()
+                cvts[cat].add(article_obj)
+                render_time[cat] += time.perf_counter() - t
+        finally:
+            stop.set()
+            for cvt in cvts.values():
+                cvt.close()
+            # prefetched pages no scrape asked for, e.g. of failed entries
+            FETCHER.discard()
+        reader.result()
+    if incremental:
+        print('%s articles already rendered, skipped.'%skipped)
+    dup_log = ''.join(dup_log)
+    if dup_log:
+        print(dup_log + '%s duplicates collapsed.'%sum(len(c) for c in collapsed.values()))
+    if len(category) > 1:
+        print('%s unique articles in %s categories.'%(len(scraped_ids), len(category)))
+    log = 'Scraped %s articles in %.2fs with %s workers.'\
+          %(len(scrapes), max(done_at, default=start) - start, jobs)
+    print(log)
+    log_tail = dup_log + log + '\n'
+    if FETCHER.cache is not None:
+        FETCHER.cache.evict()
+        log = FETCHER.cache.summary()
         print(log)
-        log_all += log + '\n'
-    with open('log_%s.txt'%category, 'w') as f:
-        f.write(log_all)
-    cvt = Converter(wkhtmltopdf, out, css)
-    cvt.string_to_pdf(article_list)
+        log_tail += log + '\n'
+    for cat in category:
+        with open('log_%s.txt'%cat, 'w') as f:
+            f.writelines(logs[cat])
+            f.write(log_tail)
+    if seen is not None:
+        seen.close()
+    report(metrics, metrics_start)
+
+
+def output_path(path, renderer):
+    '''Give an output path the extension of the renderer
+
+    :param str path: path of the output file, with or without extension
+    :param str renderer: output backend
+    :return str
+    '''
+    root, ext = os.path.splitext(path)
+    if ext in EXTENSIONS.values():
+        return root + EXTENSIONS[renderer]
+    return path + EXTENSIONS[renderer]
+
+
+def default_out(cat):
+    '''Default path of the output file of a category
+
+    :param str cat: name of the category
+    :return str
+    '''
+    return os.path.join(PATH, '%s_%s.pdf'%(cat, datetime.now().strftime('%Y%m%d')))
+
+
+def run(args, category, out, feedly_api=None, retry_failed=False):
+    '''Run main with the command line options
+
+    :param argparse.Namespace args: output of cmd_parser
+    :param str/list category: Feedly category code(s)
+    :param str/list out: path(s) of the output file
+    :param FeedlyRSS feedly_api: long-lived Feedly client (service mode)
+    :param bool retry_failed: build a category with failed entries again next time
+    '''
+    main(args.token, category, args.wk, out, args.style, args.jobs,
+         args.per_host, args.cache, args.cache_ttl, args.incremental,
+         args.since_last_run, args.store, args.render_only, args.batch,
+         args.render_jobs, args.by_source, args.inline_images, args.image_width,
+         args.metrics, args.http2, feedly_api, args.renderer, not args.no_dedup,
+         retry_failed=retry_failed)
+
+
+def serve(args, names):
+    '''Refresh the categories on their schedule and serve the latest pdfs
+
+    :param argparse.Namespace args: output of cmd_parser
+    :param list names: category names
+    '''
+    from scripts.feedly_rss import FeedlyRSS
+    from scripts.fetcher import FETCHER
+    from scripts.service import Service, parse_schedule, HOST
+
+    feedly_api = FeedlyRSS(args.token)
+    feedly_api.open()
+    outs = {n: output_path(os.path.join(PATH, '%s_latest'%n), args.renderer) for n in names}
+    if len(names) == 1 and args.out is not None:
+        outs[names[0]] = output_path(args.out, args.renderer)
+    service = Service(lambda name, out: run(args, cat_dict[name], out, feedly_api),
+                      parse_schedule(args.every, names), outs)
+    try:
+        service.serve(HOST, args.serve)
+    finally:
+        feedly_api.close()
+        FETCHER.close()
+
+
+def backfill(args, names):
+    '''Rebuild the pdfs of a date range, one per window
+
+    Windows are checkpointed in the seen index as they are written, an
+    interrupted backfill started again only builds the windows left. A
+    window with entries that failed to scrape is not, the next backfill
+    builds it again.
+
+    :param argparse.Namespace args: output of cmd_parser
+    :param list names: category names
+    '''
+    from scripts.feedly_rss import FeedlyRSS
+    from scripts.seen import SeenIndex
+    from scripts.backfill import BackfillRSS, parse_range, windows, window_key
+
+    start, end = parse_range(args.backfill)
+    out_dir = args.out or PATH
+    os.makedirs(out_dir, exist_ok=True)
+    plan = {}
+    outs = []
+    seen = SeenIndex(SEEN)
+    total = 0
+    for name in names:
+        for label, w_start, w_end in windows(start, end, args.window):
+            total += 1
+            key = window_key(cat_dict[name], label)
+            if seen.last_run(key) is not None:
+                continue
+            plan[key] = (cat_dict[name], w_start, w_end)
+            outs.append(os.path.join(out_dir, '%s_%s.pdf'%(name, label)))
+    seen.close()
+    print('%s windows to build, %s already done.'%(len(plan), total - len(plan)))
+    if not plan:
+        return
+    # every window is a category of one batch, marked in the seen index once written
+    args = argparse.Namespace(**dict(vars(args), incremental=True, since_last_run=False))
+    run(args, list(plan), outs, BackfillRSS(FeedlyRSS(args.token), plan), retry_failed=True)
 
 
 def cmd_parser():
@@ -67,7 +550,7 @@ def cmd_parser():
                  type=str,
                  dest='cat',
                  metavar='<category>',
-                 help='name of the category')
+                 help='name of the category, several separated by commas, or all')
     parser.add_argument('-wk', '--wkhtmltopdf',
                  required=False,
                  default=WK,
@@ -75,15 +558,14 @@ def cmd_parser():
                  dest='wk',
                  metavar='<wkhtmltopdf>',
                  help='path of wkhtmltopdf')
-    cat = parser.parse_args().cat
-    out = os.path.join(PATH, '%s_%s.pdf'%(cat, datetime.now().strftime('%Y%m%d')))
     parser.add_argument('-o', '--out',
                  required=False,
-                 default=out,
+                 default=None,
                  type=str,
                  dest='out',
                  metavar='<output>',
-                 help='path of the output file')
+                 help='path of the output file (single category only), '
+                      '<category>_<date>.pdf by default; the output directory with --backfill')
     parser.add_argument('-s', '--style',
                  required=False,
                  default=STYLE,
@@ -91,11 +573,163 @@ def cmd_parser():
                  dest='style',
                  metavar='<style>',
                  help='path of the css file')
-    return parser.parse_args()
+    parser.add_argument('-j', '--jobs',
+                 required=False,
+                 default=JOBS,
+                 type=int,
+                 dest='jobs',
+                 metavar='<jobs>',
+                 help='number of concurrent scraping workers')
+    parser.add_argument('--per-host',
+                 required=False,
+                 default=MAX_PER_HOST,
+                 type=int,
+                 dest='per_host',
+                 metavar='<connections>',
+                 help='max concurrent connections to one publisher host')
+    parser.add_argument('--cache',
+                 required=False,
+                 default=CACHE,
+                 type=str,
+                 dest='cache',
+                 metavar='<cache dir>',
+                 help='path of the http cache, None to disable')
+    parser.add_argument('--cache-ttl',
+                 required=False,
+                 default=TTL,
+                 type=float,
+                 dest='cache_ttl',
+                 metavar='<hours>',
+                 help='hours before a cached page is revalidated')
+    parser.add_argument('-i', '--incremental',
+                 action='store_true',
+                 dest='incremental',
+                 help='skip entries already rendered for the category')
+    parser.add_argument('--since-last-run',
+                 action='store_true',
+                 dest='since_last_run',
+                 help='only read entries published since the last run')
+    parser.add_argument('--store',
+                 required=False,
+                 default=STORE,
+                 type=str,
+                 dest='store',
+                 metavar='<store dir>',
+                 help='path of the parsed article store, None to disable')
+    parser.add_argument('--render-only',
+                 action='store_true',
+                 dest='render_only',
+                 help='render the last run of the category from the store')
+    parser.add_argument('-b', '--batch',
+                 required=False,
+                 default=BATCH_SIZE,
+                 type=int,
+                 dest='batch',
+                 metavar='<articles>',
+                 help='articles rendered per intermediate pdf')
+    parser.add_argument('-rj', '--render-jobs',
+                 required=False,
+                 default=WORKERS,
+                 type=int,
+                 dest='render_jobs',
+                 metavar='<jobs>',
+                 help='number of wkhtmltopdf processes run at once')
+    parser.add_argument('--by-source',
+                 action='store_true',
+                 dest='by_source',
+                 help='one section per source, with a table of contents')
+    parser.add_argument('--inline-images',
+                 action='store_true',
+                 dest='inline_images',
+                 help='download images before rendering')
+    parser.add_argument('--image-width',
+                 required=False,
+                 default=MAX_WIDTH,
+                 type=int,
+                 dest='image_width',
+                 metavar='<px>',
+                 help='downscale wider images (needs Pillow), 0 to keep the size')
+    parser.add_argument('-m', '--metrics',
+                 required=False,
+                 default=None,
+                 type=str,
+                 dest='metrics',
+                 metavar='<report>',
+                 help='path of the metrics report (.json, or .prom for Prometheus)')
+    parser.add_argument('--http2',
+                 action='store_true',
+                 dest='http2',
+                 help='fetch publisher pages over HTTP/2 (needs httpx[http2])')
+    parser.add_argument('-r', '--renderer',
+                 required=False,
+                 default=RENDERER,
+                 choices=list(EXTENSIONS),
+                 type=str,
+                 dest='renderer',
+                 metavar='<renderer>',
+                 help='wkhtmltopdf, weasyprint (in process), html or epub (no page layout)')
+    parser.add_argument('--no-dedup',
+                 action='store_true',
+                 dest='no_dedup',
+                 help='keep entries that are the same story (url, DOI or title)')
+    parser.add_argument('--serve',
+                 required=False,
+                 default=None,
+                 nargs='?',
+                 const=PORT,
+                 type=int,
+                 dest='serve',
+                 metavar='<port>',
+                 help='stay up, refresh the categories and serve the latest pdfs '
+                      '(port %s by default)'%PORT)
+    parser.add_argument('--every',
+                 required=False,
+                 default=str(EVERY),
+                 type=str,
+                 dest='every',
+                 metavar='<minutes>',
+                 help='refresh interval with --serve, for all (60) or per category (daily=30,econ=240)')
+    parser.add_argument('--backfill',
+                 required=False,
+                 default=None,
+                 type=str,
+                 dest='backfill',
+                 metavar='<first day>[,<last day>]',
+                 help='rebuild a date range (YYYY-MM-DD, until yesterday at the latest), one pdf per '
+                      'window in the -o directory, resumes an interrupted run')
+    parser.add_argument('--window',
+                 required=False,
+                 default=WINDOW,
+                 type=int,
+                 dest='window',
+                 metavar='<days>',
+                 help='days per pdf with --backfill')
+    args = parser.parse_args()
+    # checked without importing httpx, it is only loaded by the scraping stage
+    if args.http2 and (importlib.util.find_spec('httpx') is None
+                       or importlib.util.find_spec('h2') is None):
+        parser.error('--http2 needs pip install httpx[http2]')
+    # found before scraping starts, the first batch would fail after it
+    if args.renderer == 'weasyprint' and importlib.util.find_spec('weasyprint') is None:
+        parser.error('--renderer weasyprint needs pip install weasyprint')
+    if args.backfill is not None:
+        from scripts.backfill import parse_range
+        try:
+            parse_range(args.backfill)
+        except ValueError as e:
+            parser.error('--backfill: %s'%e)
+    return args
 
 
 if __name__ == '__main__':
     args = cmd_parser()
     # path of output file
-    
-    main(args.token, cat_dict[args.cat], args.wk, args.out, args.style)
\ No newline at end of file
+    names = list(cat_dict) if args.cat == 'all' else args.cat.split(',')
+    if args.serve is not None:
+        serve(args, names)
+    elif args.backfill is not None:
+        backfill(args, names)
+    elif len(names) == 1:
+        run(args, cat_dict[names[0]], args.out or default_out(names[0]))
+    else:
+        run(args, [cat_dict[n] for n in names], [default_out(n) for n in names])
\ No newline at end of file
@@ -1,9 +1,33 @@
 import re
 import time
-import requests
 from datetime import datetime
-from bs4 import BeautifulSoup
-
+from bs4 import BeautifulSoup, SoupStrainer
+
+from scripts.fetcher import FETCHER, FetchPolicy, DEFAULT_POLICY
+from scripts.metrics import METRICS
+from scripts.rules import Rule, Rules, parse_tree, reverse_name, split_names
+
+# bump whenever parsing output changes, stored fragments are keyed by it
+PARSER_VERSION = 2
+# html parsing backend
+#   'bs4': build the whole page (reference)
+#   'strainer': only build the article container (faster, same output)
+PARSER = 'strainer'
+# tags kept by parse_bs_page
+TAGS = ['h2', 'p', 'ul', 'img']
+MEDIA_RE = re.compile(r'(img|iframe)')
+# build papers from the Feedly entry alone when it has the authors and abstract
+FEED_PAPERS = True
+# shortest Feedly summary taken as an abstract
+MIN_ABSTRACT = 200
+# publisher prefix/suffix of Feedly origin titles, e.g. 'Wiley: Econometrica: Table of Contents'
+JOURNAL_RE = re.compile(r'^(SAGE Publications Inc|iorms|Wiley|The University of Chicago Press|'
+                        r'MIT Press|ScienceDirect Publication): |: Table of Contents$| Current Issue$')
+# issue line ahead of the abstract in TOC summaries, e.g. 'Journal of Marketing, Ahead of Print. <br/>'
+ISSUE_RE = re.compile(r'^[^<]*(Ahead of Print|Volume \d+)[^<]*<br\s*/?>', re.I)
+ABSTRACT_RE = re.compile(r'^(ABSTRACT:?|Abstract:)\s*')
+# cut summaries, e.g. 'We show that […]' or 'We show that...'
+TRUNCATED_RE = re.compile(r'\[(…|\.\.\.)\]|(…|\.\.\.)$')
 
 class Articles:
     '''Class to story article information
@@ -12,13 +36,53 @@ class Articles:
     :attr str content: title of the article
     :attr list article_json_list: a list to store Feedly stream contents
     :attr str origin: origin of the article
+    :attr str entry_id: Feedly entry id
+    :attr str source: Feedly source (key of ORI_DICT)
+    :attr tuple container: (name, attrs) of the article body on the publisher page,
+        None if the article is built from the Feedly entry
+    :attr list drop: (name, attrs) of elements removed from the container
+
+    Instances only have the slots below, one record per entry is kept until
+    the pdf is written. container, drop and the Papers settings are class
+    attributes, set on the subclasses.
     '''
+    __slots__ = ('entry_id', 'source', 'title', 'content', 'published', 'origin', 'origin_url')
+    container = None
+    drop = []
+
     def __init__(self):
+        self.entry_id = ''
+        self.source = ''
         self.title = ''
         self.content = ''
         self.published = ''
         self.origin = ''
         self.origin_url = ''
+
+    def to_dict(self):
+        '''Serialize the parsed article
+
+        :return dict
+        '''
+        return {'entry_id': self.entry_id,
+                'source': self.source,
+                'title': self.title,
+                'content': self.content,
+                'published': self.published,
+                'origin': self.origin,
+                'origin_url': self.origin_url}
+
+    @classmethod
+    def from_dict(cls, d):
+        '''Rebuild a parsed article from to_dict output
+
+        :param dict d: serialized article
+        :return Articles
+        '''
+        article = cls()
+        for k, v in d.items():
+            setattr(article, k, v)
+        return article
         
     @staticmethod
     def timestamp2str(timestamp):
@@ -30,41 +94,97 @@ class Articles:
         timestamp = int(timestamp) / 1000
         return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
         
-    @staticmethod
-    def get_page(url):
+    def get_page(self, url, container=None):
         '''get bs parsed page
         
         :param str url: url of page
+        :param tuple container: (name, attrs) of the only element needed,
+            with PARSER = 'strainer' the rest of the page is not built
         :return bs4.BeautifulSoup
         '''
-        html = requests.get(url, headers={'User-Agent': 'GhostBrowser'}).content.decode('utf-8')
-        return BeautifulSoup(html, 'lxml')
+        FETCHER.set_policy(url, POLICY_DICT.get(self.source, DEFAULT_POLICY))
+        html = FETCHER.get(url)
+        with METRICS.timer('parse', self.source):
+            if PARSER == 'strainer' and container is not None:
+                return BeautifulSoup(html, 'lxml', parse_only=SoupStrainer(*container))
+            return BeautifulSoup(html, 'lxml')
+
+    def get_tree(self, url, head_only=False):
+        '''get lxml parsed page, for Rules.extract
+
+        :param str url: url of page
+        :param bool head_only: only download the <head> of the page
+        :return lxml.html.HtmlElement
+        '''
+        FETCHER.set_policy(url, POLICY_DICT.get(self.source, DEFAULT_POLICY))
+        html = FETCHER.get_head(url) if head_only else FETCHER.get(url)
+        with METRICS.timer('parse', self.source):
+            return parse_tree(html)
+
+    @classmethod
+    def page_url(cls, stream_content):
+        '''url of the page get_content will fetch
+
+        :param dict stream_content: Feedly stream contents
+        :return str: url, None if the article is built from the stream only
+        '''
+        if cls.container is None:
+            return None
+        return stream_content.get('canonicalUrl')
+
+    @classmethod
+    def prefetch_url(cls, stream_content):
+        '''url of the full page to prefetch
+
+        :param dict stream_content: Feedly stream contents
+        :return str: url, None if get_content needs no full page
+        '''
+        return cls.page_url(stream_content)
            
-    def parse_bs_page(self, article_bs):
-        '''parse article bs page
-        
+    def fragments(self, article_bs):
+        '''html fragments of the article, in order
+
         :param bs4.BeautifulSoup article_bs: bs page
-        :return str: article in string
+        :return generator: str
         '''
-        article_text = '<h2>%s</h2><p><i>%s, %s</i></p><br>'%(self.title, self.origin, self.published)
-        for i in article_bs.find_all(re.compile(r'(h2|p|ul|img)')):
+        yield '<h2>%s</h2><p><i>%s, %s</i></p><br>'%(self.title, self.origin, self.published)
+        for i in article_bs.find_all(TAGS):
             if i.name == 'p' and not i.has_attr('class'):
-                if i.find(re.compile(r'(img|iframe)')) is not None:
+                if i.find(MEDIA_RE) is not None:
                     continue
-                if len(str(i).strip()) == 0:
+                p = str(i).strip()
+                if len(p) == 0:
                     continue
-                article_text += '%s<br>'%str(i).strip()
+                yield '%s<br>'%p
             if i.name == 'h2':
-                article_text += '<h3>%s</h3>'%i.text
+                yield '<h3>%s</h3>'%i.text
             if i.name == 'ul' and not i.has_attr('class'):
-                article_text += '%s<br>'%str(i)
+                yield '%s<br>'%str(i)
             if i.name == 'img' and ('jpeg' in i['src'] or 'svgz' in i['src'] or 'png' in i['src']):
                 if 'http' not in i['src']:
                     i['src'] = self.origin_url + i['src']
                 i['src'] = i['src'].replace('svgz', 'png')
-                article_text += '<center><img src="%s" style="width:80%%"></center>'%i['src']
-        article_text = article_text.replace('<br><h', '<h')\
-                                   .replace('\n', '')
+                yield '<center><img src="%s" style="width:80%%"></center>'%i['src']
+
+    def parse_bs_page(self, article_bs):
+        '''parse article bs page
+
+        Fragments are cleaned one by one and appended in place, the page is
+        not copied again by replace passes. The last fragment is held back,
+        a heading drops the <br> ahead of it.
+
+        :param bs4.BeautifulSoup article_bs: bs page
+        :return str: article in string
+        '''
+        article_text = ''
+        last = ''
+        for part in self.fragments(article_bs):
+            part = part.replace('\n', '').replace('<br><h', '<h')
+            if part.startswith('<h') and last.endswith('<br>'):
+                last = last[:-4]
+            article_text += last
+            last = part
+        article_text += last
         return article_text
 
     def extract_content(self, url):
@@ -72,14 +192,26 @@ class Articles:
         
         :param str url: url of the page to scrape
         '''
-        pass
+        bs = self.get_page(url, self.container)
+        article_bs = bs.find(*self.container)
+        for name, attrs in self.drop:
+            article_bs.find(name, attrs).decompose()
+        self.content = self.parse_bs_page(article_bs)
         
     def get_content(self, stream_content):
         '''combine title, content and publish date
         
         :param dict stream_content: Feedly stream contents        
         '''
-        pass
+        self.title = stream_content['title']
+        self.origin = stream_content['origin']['title']
+        self.origin_url = stream_content['origin']['htmlUrl']
+        self.published = self.timestamp2str(stream_content['published'])
+        if self.container is None:
+            article_bs = BeautifulSoup(stream_content['content']['content'], 'lxml')
+            self.content = self.parse_bs_page(article_bs)
+        else:
+            self.extract_content(stream_content['canonicalUrl'])
 
     def test(self):
         print('Title: %s'%self.title, 
@@ -91,107 +223,136 @@ class Articles:
 
 class ForbesArticles(Articles):
     '''Articles from Forbes'''
-    def extract_content(self, url):
-        bs = self.get_page(url)
-        article_class = 'article-body fs-article fs-responsive-text current-article'
-        article_bs = bs.find('div', {'class': article_class})
-        self.content = self.parse_bs_page(article_bs)
-        
-    def get_content(self, stream_content):
-        self.title = stream_content['title']
-        self.origin = stream_content['origin']['title']
-        self.origin_url = stream_content['origin']['htmlUrl']
-        self.published = self.timestamp2str(stream_content['published'])
-        url = stream_content['canonicalUrl']
-        self.extract_content(url)
+    __slots__ = ()
+    container = ('div', {'class': 'article-body fs-article fs-responsive-text current-article'})
 
 
 class HbrArticles(Articles):
     '''Articles from Harvard Business Review'''
-    def extract_content(self, url):
-        bs = self.get_page(url)
-        article_class = 'article-body standard-content'
-        article_bs = bs.find('div', {'class': article_class})
-        article_bs.find('div', {'class': 'left-rail--container'}).decompose()
-        self.content = self.parse_bs_page(article_bs)
-        
-    def get_content(self, stream_content):
-        self.title = stream_content['title']
-        self.origin = stream_content['origin']['title']
-        self.origin_url = stream_content['origin']['htmlUrl']
-        self.published = self.timestamp2str(stream_content['published'])
-        url = stream_content['canonicalUrl']
-        self.extract_content(url)
+    __slots__ = ()
+    container = ('div', {'class': 'article-body standard-content'})
+    drop = [('div', {'class': 'left-rail--container'})]
 
 
 class SmrArticles(Articles):
-    '''Articles from MIT Sloan Management Review'''        
-    def get_content(self, stream_content):
-        self.title = stream_content['title']
-        self.origin = stream_content['origin']['title']
-        self.origin_url = stream_content['origin']['htmlUrl']
-        self.published = self.timestamp2str(stream_content['published'])
-        article_bs = BeautifulSoup(stream_content['content']['content'], 'lxml')
-        self.content = self.parse_bs_page(article_bs)
+    '''Articles from MIT Sloan Management Review'''
+    __slots__ = ()
 
 
 class McKinseyArticles(Articles):
     '''Articles from McKinsey Insight'''
-    def extract_content(self, url):
-        bs = self.get_page(url)
-        article_class = 'divArticleBody'
-        article_bs = bs.find('div', {'id': article_class})
-        self.content = self.parse_bs_page(article_bs)
-
-    def get_content(self, stream_content):
-        self.title = stream_content['title']
-        self.origin = stream_content['origin']['title']
-        self.origin_url = stream_content['origin']['htmlUrl']
-        self.published = self.timestamp2str(stream_content['published'])
-        url = stream_content['canonicalUrl']
-        self.extract_content(url)
+    __slots__ = ()
+    container = ('div', {'id': 'divArticleBody'})
 
 
 class NielsenArticles(Articles):
-    '''Articles from Nielsen'''        
-    def get_content(self, stream_content):
-        self.title = stream_content['title']
-        self.origin = stream_content['origin']['title']
-        self.origin_url = stream_content['origin']['htmlUrl']
-        self.published = self.timestamp2str(stream_content['published'])
-        article_bs = BeautifulSoup(stream_content['content']['content'], 'lxml')
-        self.content = self.parse_bs_page(article_bs)
-        
+    '''Articles from Nielsen'''
+    __slots__ = ()
+
+
 class ForresterArticles(Articles):
     '''Articles from Forrester'''
-    def extract_content(self, url):
-        bs = self.get_page(url)
-        article_class = 'post-content post-body__item'
-        article_bs = bs.find('div', {'class': article_class})
-        self.content = self.parse_bs_page(article_bs)
-        
-    def get_content(self, stream_content):
-        self.title = stream_content['title']
-        self.origin = stream_content['origin']['title']
-        self.origin_url = stream_content['origin']['htmlUrl']
-        self.published = self.timestamp2str(stream_content['published'])
-        url = stream_content['canonicalUrl']
-        self.extract_content(url)
+    __slots__ = ()
+    container = ('div', {'class': 'post-content post-body__item'})
 
 
 class MartechArticles(Articles):
     '''Articles from Martech'''
-    def get_content(self, stream_content):
-        self.title = stream_content['title']
-        self.origin = stream_content['origin']['title']
-        self.origin_url = stream_content['origin']['htmlUrl']
-        self.published = self.timestamp2str(stream_content['published'])
-        url = stream_content['originId']
-        article_bs = BeautifulSoup(stream_content['content']['content'], 'lxml')
-        self.content = self.parse_bs_page(article_bs)
+    __slots__ = ()
 
 
 class Papers(Articles):
+    '''Papers from journals
+
+    Landing pages are read by the rules spec, one pass over the page.
+
+    :attr Rules rules: where title, authors, journal and abstract are on the landing page
+    :attr str url_field: Feedly field holding the landing page url
+    :attr bool strip_query: drop the query string of the url
+    :attr bool feed_metadata: the Feedly entry may hold everything (see from_feed)
+    :attr bool head_only: all fields are <meta> tags, only the <head> is fetched
+    '''
+    __slots__ = ()
+    rules = None
+    url_field = 'canonicalUrl'
+    strip_query = False
+    feed_metadata = True
+    head_only = False
+
+    @classmethod
+    def page_url(cls, stream_content):
+        if cls.rules is None:
+            return None
+        url = stream_content[cls.url_field]
+        return url.split('?')[0] if cls.strip_query else url
+
+    @staticmethod
+    def feed_abstract(stream_content):
+        '''Get the abstract from the Feedly summary
+
+        :param dict stream_content: Feedly stream contents
+        :return str: abstract, None if the entry lacks the authors or abstract, or the
+            summary is cut short
+        '''
+        if not FEED_PAPERS or not stream_content.get('author'):
+            return None
+        summary = stream_content.get('summary', {}).get('content', '')
+        abstract = BeautifulSoup(ISSUE_RE.sub('', summary), 'lxml').text.strip()
+        abstract = ABSTRACT_RE.sub('', abstract)
+        if len(abstract) < MIN_ABSTRACT or TRUNCATED_RE.search(abstract):
+            return None
+        return abstract
+
+    @classmethod
+    def feed_authors(cls, author):
+        '''Format the Feedly author field like the authors of the landing page
+
+        :param str author: Feedly author field
+        :return str
+        '''
+        rule = cls.rules.fields.get('authors') if cls.rules is not None else None
+        # the fmt of other rules reads a whole field, not a name
+        if rule is None or not (rule.many or rule.children):
+            return ', '.join(split_names(author))
+        names = split_names(author)
+        if rule.fmt is not None:
+            names = [rule.fmt(n) for n in names]
+        return rule.join(names)
+
+    @classmethod
+    def prefetch_url(cls, stream_content):
+        if cls.head_only:
+            return None
+        if cls.feed_metadata and cls.feed_abstract(stream_content) is not None:
+            return None
+        return cls.page_url(stream_content)
+
+    def from_feed(self, stream_content):
+        '''Build the paper from the Feedly entry, without fetching the landing page
+
+        :param dict stream_content: Feedly stream contents
+        :return bool: whether the entry had everything
+        '''
+        abstract = self.feed_abstract(stream_content)
+        if abstract is None:
+            return False
+        self.origin_url = self.page_url(stream_content) or stream_content['originId']
+        self.title = stream_content['title']
+        self.origin = self.feed_authors(stream_content['author'])
+        self.published = JOURNAL_RE.sub('', stream_content['origin']['title'].strip())
+        self.content = self.parse_bs_page(abstract)
+        return True
+
+    def get_content(self, stream_content):
+        if self.feed_metadata and self.from_feed(stream_content):
+            return
+        self.origin_url = self.page_url(stream_content)
+        fields = self.rules.extract(self.get_tree(self.origin_url, self.head_only))
+        self.title = fields['title']
+        self.origin = fields['authors']
+        self.published = fields['journal']
+        self.content = self.parse_bs_page(fields['abstract'])
+
     def parse_bs_page(self, abstract):
         '''parse article bs page
         
@@ -205,32 +366,32 @@ class Papers(Articles):
 
 class SagePapers(Papers):
     '''JMR, JM'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl']
-        article_bs = self.get_page(self.origin_url)
-        article_info = article_bs.find('meta', {'property': 'og:title'})['content']
-        self.title, authors = article_info.split(' - ', 1)
-        self.origin = authors[:-6]
-        self.published = article_bs.find('meta', {'name': 'citation_journal_title'})['content']
-        abstract = article_bs.find('div', {'class': 'abstractSection abstractInFull'}).text
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    # og:title is '<title> - <authors>, <year>'
+    rules = Rules(title=Rule('meta', {'property': 'og:title'},
+                             fmt=lambda s: s.split(' - ', 1)[0]),
+                  authors=Rule('meta', {'property': 'og:title'},
+                               fmt=lambda s: s.split(' - ', 1)[1][:-6]),
+                  journal=Rule('meta', {'name': 'citation_journal_title'}),
+                  abstract=Rule('div', {'class': 'abstractSection abstractInFull'}, get='text'))
 
 
 class InformsPapers(Papers):
     '''ISR, MktgSci, MngSci'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl'].split('?')[0]
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'name': 'dc.Title'})['content']
-        authors = article_bs.find_all('meta', {'name': 'dc.Creator'})
-        self.origin  = ', '.join([i['content'].strip().replace('  ', ' ') for i in authors])
-        self.published = article_bs.find('meta', {'name': 'citation_journal_title'})['content']       
-        abstract = article_bs.find('div', {'class': 'abstractSection abstractInFull'}).text
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    strip_query = True
+    rules = Rules(title=Rule('meta', {'name': 'dc.Title'}),
+                  authors=Rule('meta', {'name': 'dc.Creator'}, many=True,
+                               fmt=lambda s: s.strip().replace('  ', ' ')),
+                  journal=Rule('meta', {'name': 'citation_journal_title'}),
+                  abstract=Rule('div', {'class': 'abstractSection abstractInFull'}, get='text'))
 
 
 class OxfordPapers(Papers):
     '''JCR, QJE'''
+    __slots__ = ()
+    feed_metadata = False
+
     def get_content(self, stream_content):
         self.origin_url = stream_content['originId']
         self.title = stream_content['title']
@@ -243,127 +404,102 @@ class OxfordPapers(Papers):
 
 class WileyPapers(Papers):
     '''Econometrica'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl']
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'property': 'og:title'})['content']
-        authors = article_bs.find_all('meta', {'name': 'citation_author'})
-        self.origin  = ', '.join([i['content'].strip() for i in authors])
-        self.published = article_bs.find('meta', {'name': 'citation_journal_title'})['content']       
-        abstract = article_bs.find('div', {'class': 'article-section__content en main'}).text
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    rules = Rules(title=Rule('meta', {'property': 'og:title'}),
+                  authors=Rule('meta', {'name': 'citation_author'}, many=True, fmt=str.strip),
+                  journal=Rule('meta', {'name': 'citation_journal_title'}),
+                  abstract=Rule('div', {'class': 'article-section__content en main'}, get='text'))
 
 
 class NBERPapers(Papers):
     '''NBER'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl']
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'name': 'dcterms.title'})['content']
-        self.origin = article_bs.find('meta', {'name': 'dcterms.creator'})['content']
-        self.published = article_bs.find('meta', {'name': 'citation_technical_report_institution'})['content']       
-        abstract = article_bs.find('div', {'class': 'page-header__intro-inner'}).text
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    rules = Rules(title=Rule('meta', {'name': 'dcterms.title'}),
+                  authors=Rule('meta', {'name': 'dcterms.creator'}),
+                  journal=Rule('meta', {'name': 'citation_technical_report_institution'}),
+                  abstract=Rule('div', {'class': 'page-header__intro-inner'}, get='text'))
 
 
 class AEAPapers(Papers):
     '''AER'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl']
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'name': 'citation_title'})['content']
-        authors = article_bs.find_all('meta', {'name': 'citation_author'})
-        self.origin = ', '.join([' '.join(i['content'].split(', ')[::-1]) for i in authors])
-        self.published = article_bs.find('meta', {'name': 'citation_journal_title'})['content']       
-        abstract = article_bs.find('section', {'class': 'article-information abstract'}).text
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    rules = Rules(title=Rule('meta', {'name': 'citation_title'}),
+                  authors=Rule('meta', {'name': 'citation_author'}, many=True, fmt=reverse_name),
+                  journal=Rule('meta', {'name': 'citation_journal_title'}),
+                  abstract=Rule('section', {'class': 'article-information abstract'}, get='text'))
 
 
 class ChicagoPapers(Papers):
     '''JPE'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl'].split('?')[0]
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'name': 'dc.Title'})['content']
-        authors = article_bs.find_all('meta', {'name': 'dc.Creator'})
-        self.origin  = ', '.join([i['content'].strip().replace('  ', ' ') for i in authors])
-        self.published = article_bs.find('meta', {'name': 'citation_journal_title'})['content']       
-        abstract = article_bs.find('div', {'class': 'abstractSection abstractInFull'}).text
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    strip_query = True
+    rules = InformsPapers.rules
 
 
 class MITPapers(Papers):
     '''RES'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl']
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'name': 'citation_title'})['content']
-        authors = article_bs.find_all('div', {'class': 'info-card-name'})
-        self.origin  = ', '.join([i.text.strip() for i in authors])
-        self.published = article_bs.find('meta', {'name': 'citation_journal_title'})['content']       
-        abstract = article_bs.find('section', {'class': 'abstract'}).text
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    rules = Rules(title=Rule('meta', {'name': 'citation_title'}),
+                  authors=Rule('div', {'class': 'info-card-name'}, get='text', many=True,
+                               fmt=str.strip),
+                  journal=Rule('meta', {'name': 'citation_journal_title'}),
+                  abstract=Rule('section', {'class': 'abstract'}, get='text'))
 
 
 class PNASPapers(Papers):
     '''PNAS'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl']
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'name': 'DC.Title'})['content']
-        authors = article_bs.find_all('meta', {'name': 'DC.Contributor'})
-        self.origin  = ', '.join([i['content'].strip() for i in authors])
-        self.published = article_bs.find('meta', {'name': 'citation_journal_title'})['content']       
-        abstract = article_bs.find('meta', {'name': 'citation_abstract'})['content']
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    head_only = True
+    rules = Rules(title=Rule('meta', {'name': 'DC.Title'}),
+                  authors=Rule('meta', {'name': 'DC.Contributor'}, many=True, fmt=str.strip),
+                  journal=Rule('meta', {'name': 'citation_journal_title'}),
+                  abstract=Rule('meta', {'name': 'citation_abstract'}))
 
 
 class NatureDataPapers(Papers):
     '''Nature'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl']
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'name': 'citation_title'})['content']
-        authors = article_bs.find_all('a', {'data-test': 'author-name'})
-        if len(authors) > 3:
-            tail = ' ...'
-            authors = authors[:3]
-        else:
-            tail = ''
-        self.origin  = ', '.join([i.text.strip() for i in authors]) + tail
-        self.published = article_bs.find('meta', {'name': 'WT.cg_n'})['content']       
-        abstract = article_bs.find('div', {'class': 'c-article-section__content'}).text
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    # first three authors
+    rules = Rules(title=Rule('meta', {'name': 'citation_title'}),
+                  authors=Rule('a', {'data-test': 'author-name'}, get='text', many=True,
+                               fmt=str.strip,
+                               join=lambda l: ', '.join(l[:3]) + (' ...' if len(l) > 3 else '')),
+                  journal=Rule('meta', {'name': 'WT.cg_n'}),
+                  abstract=Rule('div', {'class': 'c-article-section__content'}, get='text'))
 
 
 class ElsevierPapers(Papers):
     '''IJRM'''
+    __slots__ = ()
     @staticmethod
     def get_name(name_html):
-        f = name_html.find('span', {'class': 'text given-name'}).text
-        l = name_html.find('span', {'class': 'text surname'}).text
+        f = name_html.xpath('string(.//span[@class="text given-name"])')
+        l = name_html.xpath('string(.//span[@class="text surname"])')
         return f + ' ' + l
-        
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl']
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'name': 'citation_title'})['content']
-        authors = article_bs.find_all('a', {'class': 'author size-m workspace-trigger'})
-        self.origin  = ', '.join([self.get_name(i) for i in authors])
-        self.published = article_bs.find('meta', {'name': 'citation_journal_title'})['content']       
-        abstract = article_bs.find('p', {'id': 'sp0005'}).text
-        self.content = self.parse_bs_page(abstract)
+
+    rules = Rules(title=Rule('meta', {'name': 'citation_title'}),
+                  authors=Rule('a', {'class': 'author size-m workspace-trigger'}, many=True,
+                               get=lambda a: ElsevierPapers.get_name(a)),
+                  journal=Rule('meta', {'name': 'citation_journal_title'}),
+                  abstract=Rule('p', {'id': 'sp0005'}, get='text'))
 
 
 class JMISPapers(Papers):
     '''JMIS'''
+    __slots__ = ()
+    rules = Rules(title=Rule('div', {'class': 'margin-bottom-5'}, get='text'),
+                  authors=Rule('div', {'class': 'margin-bottom-10'}, get='text', children='a',
+                               fmt=reverse_name),
+                  journal=Rule('h4', get='text'))
+
     def get_content(self, stream_content):
-        self.origin_url = stream_content['canonicalUrl']
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('div', {'class': 'margin-bottom-5'}).text
-        authors = article_bs.find('div', {'class': 'margin-bottom-10'}).find_all('a')
-        self.origin = ', '.join([' '.join(i.text.split(', ')[::-1]) for i in authors])
-        self.published = article_bs.find('h4').text      
+        if self.from_feed(stream_content):
+            return
+        self.origin_url = self.page_url(stream_content)
+        fields = self.rules.extract(self.get_tree(self.origin_url))
+        self.title = fields['title']
+        self.origin = fields['authors']
+        self.published = fields['journal']
         abstract = stream_content['summary']['content']\
                      .replace('ABSTRACT: <p>', '').replace('</p>', '')
         self.content = self.parse_bs_page(abstract)
@@ -371,15 +507,14 @@ class JMISPapers(Papers):
 
 class MISQPapers(Papers):
     '''MISQ'''
-    def get_content(self, stream_content):
-        self.origin_url = stream_content['originId']
-        article_bs = self.get_page(self.origin_url)
-        self.title = article_bs.find('meta', {'name': 'bepress_citation_title'})['content']
-        authors = article_bs.find_all('meta', {'name': 'bepress_citation_author'})
-        self.origin = ', '.join([' '.join(i['content'].split(', ')[::-1]) for i in authors])
-        self.published = article_bs.find('meta', {'name': 'bepress_citation_journal_title'})['content']       
-        abstract = article_bs.find('meta', {'name': 'description'})['content']
-        self.content = self.parse_bs_page(abstract)
+    __slots__ = ()
+    url_field = 'originId'
+    head_only = True
+    rules = Rules(title=Rule('meta', {'name': 'bepress_citation_title'}),
+                  authors=Rule('meta', {'name': 'bepress_citation_author'}, many=True,
+                               fmt=reverse_name),
+                  journal=Rule('meta', {'name': 'bepress_citation_journal_title'}),
+                  abstract=Rule('meta', {'name': 'description'}))
     
     
 ORI_DICT = {
@@ -411,6 +546,21 @@ ORI_DICT = {
     'Management Information Systems Quarterly': MISQPapers
 }
 
+# fetch policy per origin, DEFAULT_POLICY for the others
+POLICY_DICT = {
+    # slow landing pages, quick to rate limit
+    'SAGE Publications Inc: Journal of Marketing: Table of Contents':
+        FetchPolicy(read=20, retries=1, backoff=2, max_failures=2),
+    'SAGE Publications Inc: Journal of Marketing Research: Table of Contents':
+        FetchPolicy(read=20, retries=1, backoff=2, max_failures=2),
+    'ScienceDirect Publication: International Journal of Research in Marketing':
+        FetchPolicy(read=20, retries=1, backoff=2, max_failures=2),
+    # one host for three journals
+    'iorms: Information Systems Research: Table of Contents': FetchPolicy(backoff=2),
+    'iorms: Marketing Science: Table of Contents': FetchPolicy(backoff=2),
+    'iorms: Management Science: Table of Contents': FetchPolicy(backoff=2),
+}
+
  
 def article_factory(article_json):
     '''Determine article class based on the article's origin
@@ -0,0 +1,130 @@
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+
+from scripts.feedly_rss import PAGE_SIZE
+from scripts.defaults import WINDOW
+
+
+def parse_range(text):
+    '''Parse the date range given on the command line
+
+    The range ends before today, a window still filling up would be
+    recorded as done.
+
+    :param str text: '<first day>,<last day>' or '<first day>' (until yesterday), as YYYY-MM-DD
+    :return tuple: (start, end) datetimes, the last day included
+    '''
+    days = text.split(',')
+    start = datetime.strptime(days[0].strip(), '%Y-%m-%d')
+    today = datetime.combine(date.today(), time())
+    if len(days) > 1 and days[1].strip():
+        end = datetime.strptime(days[1].strip(), '%Y-%m-%d') + timedelta(days=1)
+        if end > today:
+            raise ValueError('The backfill range %s must end before today'%text)
+    else:
+        end = today
+    if end <= start:
+        raise ValueError('The backfill range %s is empty'%text)
+    return start, end
+
+
+def windows(start, end, days=WINDOW):
+    '''Split a date range into windows, newest first as Feedly streams are read
+
+    :param datetime start: start of the range
+    :param datetime end: end of the range (excluded)
+    :param int days: days per window
+    :return list: [(label, start, end)], label e.g. '20200101' or '20200101-20200107'
+    '''
+    step = timedelta(days=max(1, days))
+    out = []
+    w_start = start
+    while w_start < end:
+        w_end = min(w_start + step, end)
+        last = (w_end - timedelta(seconds=1)).strftime('%Y%m%d')
+        label = w_start.strftime('%Y%m%d')
+        if last != label:
+            label = '%s-%s'%(label, last)
+        out.append((label, w_start, w_end))
+        w_start = w_end
+    return out[::-1]
+
+
+def window_key(category, label):
+    '''Name of a window, used by main.main as a category code
+
+    It keys the seen index, so a window is done once its pdf is written
+    and its last run recorded.
+
+    :param str category: Feedly category code
+    :param str label: label of the window
+    :return str
+    '''
+    return '%s@%s'%(category, label)
+
+
+def to_ms(t):
+    '''13-digit timestamp of a datetime'''
+    return int(t.timestamp() * 1000)
+
+
+class BackfillRSS:
+    '''Stand-in for FeedlyRSS that cuts the stream of a date range into windows
+
+    Feedly streams come newest first and can only be cut with newerThan,
+    so each category is read once, from now down to the start of its
+    oldest pending window, and every entry goes to the window of its
+    publish time. Publish times are not strictly ordered in a stream, so
+    the windows of a category are only given to main.main, one after the
+    other, once the category is read. main.main scrapes and renders them in
+    parallel, one output per window. Entries of windows that are not asked
+    for (already done) are read and dropped.
+
+    :attr FeedlyRSS feedly_api: Feedly client
+    :attr dict plan: window key: (Feedly category code, start, end) as 13-digit timestamps
+    '''
+    def __init__(self, feedly_api, plan):
+        '''Initialization
+
+        :param FeedlyRSS feedly_api: Feedly client
+        :param dict plan: window key: (Feedly category code, start datetime, end datetime)
+        '''
+        self.feedly_api = feedly_api
+        self.plan = {key: (category, to_ms(start), to_ms(end))
+                     for key, (category, start, end) in plan.items()}
+
+    def refresh(self):
+        pass
+
+    def iter_pages(self, categories, newer_than=None):
+        '''Read the windows, page by page
+
+        :param list categories: window keys, newest first per Feedly category code
+        :param dict newer_than: unused, the windows carry their range
+        :return generator: (window key, list of Feedly stream contents)
+        '''
+        codes = {}
+        for key in categories:
+            category, start, end = self.plan[key]
+            codes.setdefault(category, []).append((start, end, key))
+        for category, wins in codes.items():
+            wins.sort()
+            starts = [w[0] for w in wins]
+            found = {key: [] for _, _, key in wins}
+            past = False
+            for _, entries in self.feedly_api.iter_pages([category], {category: starts[0] - 1}):
+                for article_json in entries:
+                    published = article_json['published']
+                    k = bisect_right(starts, published) - 1
+                    # the stream went past the oldest window
+                    past = k < 0
+                    if past:
+                        break
+                    if published < wins[k][1]:
+                        found[wins[k][2]].append(article_json)
+                if past:
+                    break
+            for _, _, key in wins[::-1]:
+                entries = found.pop(key)
+                for i in range(0, len(entries), PAGE_SIZE):
+                    yield key, entries[i:i + PAGE_SIZE]
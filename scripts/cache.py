@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+TTL = 24 # unit: hour
+MAX_SIZE = 200 # unit: MB
+
+class HttpCache:
+    '''On-disk cache of HTTP responses keyed by url
+
+    Each response is stored as <sha1(url)>.body with a <sha1(url)>.json
+    holding the url, ETag, Last-Modified, Content-Type and store time.
+    Entries older than ttl are revalidated instead of served. The body file mtime is
+    touched on every use and the least recently used entries are evicted
+    once the cache grows over max_size.
+
+    :attr str path: cache directory
+    :attr float ttl: freshness lifetime in seconds
+    :attr int max_bytes: size limit of the cache directory
+    :attr dict stats: hit/revalidated/miss counts and byte counts
+    '''
+    def __init__(self, path, ttl=TTL, max_size=MAX_SIZE):
+        '''Initialization
+
+        :param str path: cache directory
+        :param float ttl: freshness lifetime in hours
+        :param float max_size: size limit in MB
+        '''
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.ttl = ttl * 3600
+        self.max_bytes = int(max_size * 2**20)
+        self.stats = {'hit': 0, 'revalidated': 0, 'miss': 0,
+                      'bytes_cached': 0, 'bytes_downloaded': 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, key + '.body'), os.path.join(self.path, key + '.json')
+
+    def count(self, stat, size=0):
+        '''Record a cache event
+
+        :param str stat: 'hit', 'revalidated' or 'miss'
+        :param int size: bytes served from cache (hit/revalidated) or downloaded (miss)
+        '''
+        with self._lock:
+            self.stats[stat] += 1
+            if stat == 'miss':
+                self.stats['bytes_downloaded'] += size
+            else:
+                self.stats['bytes_cached'] += size
+
+    def get(self, url):
+        '''Get a cached response
+
+        :param str url: url of page
+        :return dict: {'body', 'etag', 'last_modified', 'fresh'}, None if not cached
+        '''
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                meta['body'] = f.read()
+        except (OSError, ValueError):
+            return None
+        meta['fresh'] = time.time() - meta['stored'] < self.ttl
+        return meta
+
+    def put(self, url, body, headers):
+        '''Store a response
+
+        :param str url: url of page
+        :param bytes body: response body
+        :param dict headers: response headers
+        '''
+        body_path, meta_path = self._paths(url)
+        meta = {'url': url,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'content_type': headers.get('Content-Type'),
+                'stored': time.time()}
+        tmp = '%s.%s.tmp'%(body_path, threading.get_ident())
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, body_path)
+        tmp = '%s.%s.tmp'%(meta_path, threading.get_ident())
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def touch(self, url):
+        '''Mark a response as revalidated (fresh again)
+
+        :param str url: url of page
+        '''
+        entry = self.get(url)
+        if entry is not None:
+            body = entry.pop('body')
+            self.put(url, body, {'ETag': entry['etag'],
+                                 'Last-Modified': entry['last_modified'],
+                                 'Content-Type': entry.get('content_type')})
+
+    def used(self, url):
+        '''Mark a response as recently used (for LRU eviction)
+
+        :param str url: url of page
+        '''
+        try:
+            os.utime(self._paths(url)[0])
+        except OSError:
+            pass
+
+    def evict(self):
+        '''Remove least recently used entries until the cache fits max_bytes
+
+        :return int: number of removed entries
+        '''
+        entries = []
+        total = 0
+        for name in os.listdir(self.path):
+            if not name.endswith('.body'):
+                continue
+            st = os.stat(os.path.join(self.path, name))
+            entries.append((st.st_mtime, st.st_size, name[:-5]))
+            total += st.st_size
+        removed = 0
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for ext in ('.body', '.json'):
+                try:
+                    os.remove(os.path.join(self.path, key + ext))
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
+
+    def summary(self):
+        '''One-line summary of the cache stats
+
+        :return str
+        '''
+        s = self.stats
+        return 'Cache: %s hit, %s revalidated, %s miss, %.1f KB from cache, %.1f KB downloaded.'\
+               %(s['hit'], s['revalidated'], s['miss'],
+                 s['bytes_cached'] / 1024, s['bytes_downloaded'] / 1024)
@@ -1,9 +1,20 @@
+import os
+import shutil
+import tempfile
+import importlib.util
+import multiprocessing
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 # Installing wkhtmltopdf
 # https://github.com/JazzCore/python-pdfkit/wiki/Installing-wkhtmltopdf
 # https://wkhtmltopdf.org/downloads.html
 import pdfkit
+from pypdf import PdfReader, PdfWriter
+
+from scripts.defaults import BATCH_SIZE, WORKERS, RENDERER, EXTENSIONS
+from scripts.ebook import write_html, write_epub
 
 OPTIONS = {
     'margin-left': '12mm',
@@ -11,40 +22,359 @@ OPTIONS = {
     'margin-bottom': '20mm',
     'margin-top': '20mm'
 }
+# extra attempts for a failed batch
+RETRIES = 2
+# start method of the render workers: the pool starts while the Feedly,
+# scrape and prefetch threads run, forking them could deadlock on a held lock
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+@lru_cache(maxsize=None)
+def configuration(wkhtmltopdf):
+    '''pdfkit configuration, built once per process
+
+    :param str wkhtmltopdf: path of wkhtmltopdf
+    :return pdfkit.configuration
+    '''
+    return pdfkit.configuration(wkhtmltopdf=wkhtmltopdf)
+
+
+def to_html(content):
+    '''Wrap article content in a html document
+
+    :param str content: article content
+    :return str: html string
+    '''
+    content = content.replace('<p></p><br>', '')
+    meta = '<meta http-equiv="Content-Type" content="text/html; charset=UTF-8">'
+    return '<html><head>%s</head><body>%s</body></html>'%(meta, content)
+
+
+def render_html(wkhtmltopdf, css, content, out, options=OPTIONS):
+    '''Render article content to a pdf file, retrying on failure
+
+    wkhtmltopdf exits with an error on e.g. a missing image but still
+    writes the pdf, such output is kept. Module level so it can run in
+    a worker process.
+
+    :param str wkhtmltopdf: path of wkhtmltopdf
+    :param str css: path of css file
+    :param str content: article content
+    :param str out: path of output pdf file
+    :param dict options: wkhtmltopdf options
+    :return bool: whether the pdf was written
+    '''
+    config = configuration(wkhtmltopdf)
+    for _ in range(RETRIES + 1):
+        try:
+            pdfkit.from_string(to_html(content),
+                         out,
+                         options=options,
+                         configuration=config,
+                         css=css)
+            return True
+        except OSError:
+            if os.path.exists(out) and os.path.getsize(out) > 0:
+                return True
+    return False
+
+
+def render_weasyprint(wkhtmltopdf, css, content, out, options=OPTIONS):
+    '''Render article content to a pdf file in process with WeasyPrint
+
+    Same arguments as render_html (wkhtmltopdf is unused, the margins of
+    options become the @page margins). WeasyPrint is imported on first
+    use, it takes a while to load.
+
+    :return bool: whether the pdf was written
+    '''
+    # pip install weasyprint
+    import weasyprint
+
+    page = weasyprint.CSS(string='@page { margin: %s %s %s %s }'
+                          %(options['margin-top'], options['margin-right'],
+                            options['margin-bottom'], options['margin-left']))
+    stylesheets = [page] + ([weasyprint.CSS(filename=css)] if css else [])
+    for _ in range(RETRIES + 1):
+        try:
+            weasyprint.HTML(string=to_html(content)).write_pdf(out, stylesheets=stylesheets)
+            return True
+        except (OSError, ValueError):
+            continue
+    return False
+
+
+# pdf backends, module level functions so batches can render in worker processes
+RENDERERS = {
+    'wkhtmltopdf': render_html,
+    'weasyprint': render_weasyprint,
+}
+
 
 class Converter:
     '''Convert article list (list of Article classes) to pdf
-    
-    :attr pdfkit.configuration.Configuration config: set wkhtmltopdf path
-    :attr str content: string that will be convert to pdf
+
+    Long lists are rendered in batches to intermediate pdf files which
+    are merged at the end, so only a few batches of html are held at a
+    time and a failing batch can be retried (or dropped) on its own.
+    Articles can be added one by one (add, then end) while they are
+    still being scraped, a batch starts rendering once it is full.
+    Batches are rendered by a pool of worker processes, and with by_source
+    the pdf is split into one section per Feedly source with a table of
+    contents and bookmarks.
+
+    The pdf backend is wkhtmltopdf (external binary) or WeasyPrint (in
+    process); the html and epub renderers write the articles as they are,
+    one file without page layout.
+
+    :attr str wkhtmltopdf: path of wkhtmltopdf
+    :attr str content: heading of the pdf
     :attr str css: path of css file
     :attr str out: path of output pdf file
+    :attr int batch_size: articles rendered per intermediate pdf
+    :attr int workers: wkhtmltopdf processes run at once
+    :attr bool by_source: group articles into sections by source
+    :attr dict options: wkhtmltopdf options
+    :attr str renderer: key of RENDERERS, 'html' or 'epub'
+    :attr function prepare: called on the articles of each batch before it is rendered
     '''
-    def __init__(self, wkhtmltopdf, out='out.pdf', css=None):
+    def __init__(self, wkhtmltopdf, out='out.pdf', css=None, batch_size=BATCH_SIZE,
+                 workers=WORKERS, by_source=False, local_files=False, renderer=RENDERER,
+                 prepare=None):
         '''Initialization
-        
+
         :param str wkhtmltopdf: path of wkhtmltopdf
         :param str css: path of css file
         :param str out: path of output pdf file
+        :param int batch_size: articles rendered per intermediate pdf
+        :param int workers: wkhtmltopdf processes run at once
+        :param bool by_source: group articles into sections by source
+        :param bool local_files: allow local files (inlined images)
+        :param str renderer: key of RENDERERS, 'html' or 'epub'
+        :param function prepare: called on the articles of each batch before it is rendered
         '''
+        if renderer not in EXTENSIONS:
+            raise ValueError('Unknown renderer %s, one of %s'%(renderer, ', '.join(EXTENSIONS)))
+        if renderer == 'weasyprint' and importlib.util.find_spec('weasyprint') is None:
+            raise ImportError('The weasyprint renderer needs pip install weasyprint')
         now = datetime.now().strftime('%Y-%m-%d')
-        self.config = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf)
-        self.content = '<h1>Articles %s</h1>'%now
+        self.wkhtmltopdf = wkhtmltopdf
+        self.title = 'Articles %s'%now
+        self.content = '<h1>%s</h1>'%self.title
         self.css = css
         self.out = out
-        
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.by_source = by_source
+        self.options = dict(OPTIONS)
+        if local_files:
+            self.options['enable-local-file-access'] = None
+        self.renderer = renderer
+        self.prepare = prepare
+        # [title, queued articles, batches rendered] by section index
+        self._sections = []
+        self._index = {}
+        self._articles = []
+        # (section index, batch index, path, bool or future, entry ids)
+        self._parts = []
+        self._pending = []
+        self._tmp = None
+        self._pool = None
+
+    def render(self, content, out):
+        '''Render article content to a pdf file
+
+        :param str content: article content
+        :param str out: path of output pdf file
+        :return bool: whether the pdf was written
+        '''
+        return RENDERERS[self.renderer](self.wkhtmltopdf, self.css, content, out, self.options)
+
+    def sections(self, article_list):
+        '''Split articles into sections, in order of first appearance
+
+        :param list article_list: list of Article classes
+        :return list: [(section title or None, list of Article classes)]
+        '''
+        if not self.by_source:
+            return [(None, article_list)]
+        sections = {}
+        for a in article_list:
+            sections.setdefault(getattr(a, 'source', '') or 'Other', []).append(a)
+        return list(sections.items())
+
+    def add(self, article):
+        '''Queue an article, a batch is rendered as soon as it is full
+
+        Articles must come in output order. Batches render in the worker
+        pool while more articles are added; add blocks while 2*workers
+        batches are waiting, so only a few batches of html are held.
+
+        :param Article article: Article class
+        '''
+        if self.renderer in ('html', 'epub'):
+            self._articles.append(article)
+            return
+        title = (getattr(article, 'source', '') or 'Other') if self.by_source else None
+        if title not in self._index:
+            self._index[title] = len(self._sections)
+            self._sections.append([title, [], 0])
+        n = self._index[title]
+        articles = self._sections[n][1]
+        articles.append(article)
+        # one article more than a batch before starting, a short list
+        # without sections is rendered directly to the output in end()
+        if len(articles) > self.batch_size:
+            self.flush(n)
+
+    def flush(self, n):
+        '''Render the next batch of a section to an intermediate pdf
+
+        :param int n: section index
+        '''
+        title, articles, k = self._sections[n]
+        batch = articles[:self.batch_size]
+        self._sections[n][1:] = [articles[self.batch_size:], k + 1]
+        if self.prepare is not None:
+            self.prepare(batch)
+        parts = [a.content for a in batch]
+        if k == 0 and title is not None:
+            parts.insert(0, '<h1>%s</h1>'%title)
+        if n == 0 and k == 0 and title is None:
+            parts.insert(0, self.content)
+        content = ''.join(parts)
+        if self._tmp is None:
+            self._tmp = tempfile.mkdtemp(prefix='feedly2pdf_')
+        path = os.path.join(self._tmp, 'part_%05d_%05d.pdf'%(n, k))
+        ids = [getattr(a, 'entry_id', '') for a in batch]
+        if self.workers == 1:
+            self._parts.append((n, k, path, self.render(content, path), ids))
+            return
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context(START_METHOD))
+        future = self._pool.submit(RENDERERS[self.renderer], self.wkhtmltopdf, self.css,
+                                   content, path, self.options)
+        self._parts.append((n, k, path, future, ids))
+        self._pending.append(future)
+        # keep the html of only a few batches in memory
+        if len(self._pending) >= 2*self.workers:
+            _, not_done = wait(self._pending, return_when=FIRST_COMPLETED)
+            self._pending = list(not_done)
+
+    def end(self):
+        '''Render the queued articles that are left and write the output file
+
+        :return list: entry ids of the articles of failed batches, left out of the output
+        '''
+        failed = []
+        try:
+            if self.renderer in ('html', 'epub'):
+                if self.prepare is not None:
+                    self.prepare(self._articles)
+                write = write_html if self.renderer == 'html' else write_epub
+                write(self.title, self.sections(self._articles), self.out, self.css)
+                return failed
+            if not self.by_source and not self._parts:
+                articles = self._sections[0][1] if self._sections else []
+                if self.prepare is not None:
+                    self.prepare(articles)
+                content = ''.join([self.content] + [a.content for a in articles])
+                if not self.render(content, self.out):
+                    raise OSError('Failed to render %s'%self.out)
+                return failed
+            for n, (_, articles, _) in enumerate(self._sections):
+                if articles:
+                    self.flush(n)
+            if self._tmp is None:
+                self._tmp = tempfile.mkdtemp(prefix='feedly2pdf_')
+            titles = [title for title, _, _ in self._sections]
+            parts = []
+            for i, (n, _, path, ok, ids) in enumerate(sorted(self._parts, key=lambda p: p[:2])):
+                if not isinstance(ok, bool):
+                    ok = ok.result()
+                if ok:
+                    parts.append((n, path))
+                else:
+                    failed.extend(ids)
+                    print('Batch %s (%s) failed to render, skipped.'%(i + 1, titles[n] or 'Articles'))
+            if self.by_source:
+                self.merge_sections(titles, parts, self._tmp)
+            else:
+                self.merge([path for _, path in parts], self.out)
+            return failed
+        finally:
+            self.close()
+
+    def close(self):
+        '''Stop the worker pool, drop the intermediate pdfs and the queued articles'''
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        if self._tmp is not None:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+        self._sections = []
+        self._index = {}
+        self._articles = []
+        self._parts = []
+        self._pending = []
+        self._tmp = None
+        self._pool = None
+
     def string_to_pdf(self, article_list):
         '''Convert string to pdf file
-        
+
         :param list article_list: list of Article classes
         '''
-        for a in article_list:
-            self.content += a.content 
-        self.content = self.content.replace('<p></p><br>', '')
-        meta = '<meta http-equiv="Content-Type" content="text/html; charset=UTF-8">'
-        html_string = '<html><head>%s</head><body>%s</body></html>'%(meta, self.content)
-        pdfkit.from_string(html_string, 
-                     self.out,
-                     options=OPTIONS,
-                     configuration=self.config, 
-                     css=self.css)
\ No newline at end of file
+        try:
+            for a in article_list:
+                self.add(a)
+            self.end()
+        finally:
+            self.close()
+
+    def merge_sections(self, titles, parts, tmp):
+        '''Merge section pdf files behind a table of contents
+
+        :param list titles: section titles, by section index
+        :param list parts: [(section index, path)] of rendered batches, in order
+        :param str tmp: directory of intermediate pdf files
+        '''
+        starts = {}
+        page = 0
+        for n, path in parts:
+            starts.setdefault(n, page)
+            page += len(PdfReader(path).pages)
+        toc = os.path.join(tmp, 'toc.pdf')
+        # page numbers in the toc only shift by its own length
+        toc_pages = 1
+        for _ in range(2):
+            rows = ''.join('<li>%s ... %s</li>'%(titles[n], starts[n] + toc_pages + 1)
+                           for n in sorted(starts))
+            if not self.render('%s<ul>%s</ul>'%(self.content, rows), toc):
+                raise OSError('Failed to render %s'%toc)
+            if len(PdfReader(toc).pages) == toc_pages:
+                break
+            toc_pages = len(PdfReader(toc).pages)
+        writer = PdfWriter()
+        writer.append(toc)
+        for _, path in parts:
+            writer.append(path)
+        for n in sorted(starts):
+            writer.add_outline_item(titles[n], starts[n] + toc_pages)
+        with open(self.out, 'wb') as f:
+            writer.write(f)
+        writer.close()
+
+    @staticmethod
+    def merge(parts, out):
+        '''Merge pdf files into one
+
+        :param list parts: paths of pdf files, in order
+        :param str out: path of output pdf file
+        '''
+        writer = PdfWriter()
+        for part in parts:
+            writer.append(part)
+        with open(out, 'wb') as f:
+            writer.write(f)
+        writer.close()
@@ -0,0 +1,222 @@
+import re
+import struct
+import hashlib
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+DOI_RE = re.compile(r'(10\.\d{4,9}/[^\s"\'<>?#&]+)', re.I)
+WORD_RE = re.compile(r'\w+')
+# query parameters that only track the click
+TRACKING = {'fbclid', 'gclid', 'ref', 'src', 'cmp', 'mc_cid', 'mc_eid'}
+# titles are compared on character shingles of this length
+SHINGLE = 4
+# MinHash signature length, split into BANDS bands for the LSH buckets
+NUM_PERM = 128
+BANDS = 32
+# estimated similarity of a title candidate found through the LSH buckets
+CANDIDATE = 0.7
+# exact shingle similarity above which two titles of the same authors are one story
+THRESHOLD = 0.9
+# words that tell apart titles otherwise alike: parts, replies, corrections
+DISTINCT_RE = re.compile(r'^(\d+|[ivx]+|part|reply|replies|comment|comments|rejoinder|response|'
+                         r'correction|corrigendum|erratum|retraction|addendum)$')
+# author names shorter than this (initials) are not compared
+MIN_NAME = 3
+# shorter titles ('Editorial', 'Front Matter') are never matched on title
+MIN_WORDS = 4
+# one 32-bit hash per signature position, read from a SHAKE digest of the shingle
+HASHES = struct.Struct('<%sI'%NUM_PERM)
+
+
+def canonical_url(url):
+    '''Normalize a url for comparison
+
+    The scheme, 'www.', the fragment, a trailing slash and tracking
+    parameters are dropped, the other parameters are sorted.
+
+    :param str url: url
+    :return str
+    '''
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query)
+                             if k.lower() not in TRACKING and not k.lower().startswith('utm_')))
+    return '%s%s%s'%(host, parts.path.rstrip('/'), '?' + query if query else '')
+
+
+def entry_urls(article_json):
+    '''Urls of a Feedly entry
+
+    :param dict article_json: Feedly stream contents
+    :return list: canonicalUrl, originId and alternate links
+    '''
+    urls = [article_json.get('canonicalUrl'), article_json.get('originId')]
+    urls.extend(a.get('href') for a in article_json.get('alternate', []))
+    return [u for u in urls if u and u.startswith('http')]
+
+
+def entry_dois(urls):
+    '''DOIs found in the urls of an entry
+
+    Only urls are searched, a summary may cite the DOI of another paper.
+
+    :param list urls: output of entry_urls
+    :return set: lower case DOIs
+    '''
+    return {m.rstrip('.,;)').lower() for u in urls for m in DOI_RE.findall(u)}
+
+
+def title_words(title):
+    '''Normalized words of a title (case and punctuation dropped)
+
+    :param str title: title
+    :return list
+    '''
+    return WORD_RE.findall((title or '').lower())
+
+
+def shingles(words):
+    '''Character shingles of a normalized title
+
+    :param list words: output of title_words
+    :return set
+    '''
+    text = ' '.join(words)
+    return {text[i:i + SHINGLE] for i in range(max(1, len(text) - SHINGLE + 1))}
+
+
+def same_authors(a, b):
+    '''Whether two Feedly author fields name the same people
+
+    Only full name parts are compared, so 'J. Smith, A. Doe' and
+    'John Smith and Anna Doe' agree.
+
+    :param str a: Feedly author field
+    :param str b: Feedly author field
+    :return bool: False if either is missing
+    '''
+    names_a = {w for w in WORD_RE.findall((a or '').lower()) if len(w) >= MIN_NAME and w != 'and'}
+    names_b = {w for w in WORD_RE.findall((b or '').lower()) if len(w) >= MIN_NAME and w != 'and'}
+    if not names_a or not names_b:
+        return False
+    return len(names_a & names_b) / len(names_a | names_b) >= 0.5
+
+
+class Deduper:
+    '''Find Feedly entries that are the same story, before anything is fetched
+
+    Entries match on a canonical url, a DOI, or their title. Titles are
+    indexed by MinHash signatures of their character shingles, bucketed by
+    bands (LSH), so a new title is only compared with the few entries
+    sharing a bucket. A title match needs a second signal, a dropped entry
+    is never rendered: the titles are the same up to case and punctuation,
+    or the authors agree, the exact shingle similarity reaches threshold
+    and no word tells the titles apart ('Part II', 'Reply', ...). Entries
+    with different DOIs, or authors named on both sides that differ, are
+    never matched on title.
+
+    :attr float threshold: exact title similarity of a duplicate with the same authors
+    :attr dict entries: entry id: Feedly stream contents, of the kept entries
+    '''
+    def __init__(self, threshold=THRESHOLD):
+        '''Initialization
+
+        :param float threshold: exact title similarity of a duplicate with the same authors
+        '''
+        self.threshold = threshold
+        self.entries = {}
+        self._urls = {}
+        self._dois = {}
+        self._signatures = {}
+        self._buckets = {}
+
+    def signature(self, words):
+        '''MinHash signature of a title
+
+        :param list words: output of title_words
+        :return tuple: NUM_PERM ints, None if the title is too short
+        '''
+        if len(words) < MIN_WORDS:
+            return None
+        rows = [HASHES.unpack(hashlib.shake_128(s.encode('utf-8')).digest(HASHES.size))
+                for s in shingles(words)]
+        return tuple(map(min, zip(*rows)))
+
+    def _bands(self, sig):
+        rows = NUM_PERM // BANDS
+        return [(k, sig[k*rows:(k + 1)*rows]) for k in range(BANDS)]
+
+    def candidates(self, sig):
+        '''Indexed titles estimated close to a signature, most similar first
+
+        :param tuple sig: output of signature
+        :return list: entry ids
+        '''
+        scores = {}
+        for i in {i for band in self._bands(sig) for i in self._buckets.get(band, ())}:
+            s = sum(x == y for x, y in zip(sig, self._signatures[i])) / NUM_PERM
+            if s >= CANDIDATE:
+                scores[i] = s
+        return sorted(scores, key=scores.get, reverse=True)
+
+    def same_story(self, article_json, kept):
+        '''Confirm a title candidate
+
+        :param dict article_json: Feedly stream contents
+        :param dict kept: Feedly stream contents of the candidate
+        :return float: title similarity, None if not the same story
+        '''
+        # papers with their own DOIs, or by other people, are other stories
+        # even under the same title ('Introduction to the Special Issue')
+        dois = entry_dois(entry_urls(article_json))
+        kept_dois = entry_dois(entry_urls(kept))
+        if dois and kept_dois and not dois & kept_dois:
+            return None
+        authors = same_authors(article_json.get('author'), kept.get('author'))
+        if article_json.get('author') and kept.get('author') and not authors:
+            return None
+        words = title_words(article_json.get('title'))
+        kept_words = title_words(kept.get('title'))
+        if words == kept_words:
+            return 1.0
+        if not authors or any(DISTINCT_RE.match(w) for w in set(words) ^ set(kept_words)):
+            return None
+        a, b = shingles(words), shingles(kept_words)
+        score = len(a & b) / len(a | b)
+        return score if score >= self.threshold else None
+
+    def add(self, article_json):
+        '''Index an entry, or find the kept entry it duplicates
+
+        :param dict article_json: Feedly stream contents
+        :return tuple: (kept Feedly stream contents, reason) if a duplicate, else None
+        '''
+        entry_id = article_json['id']
+        if entry_id in self.entries:
+            return None
+        urls = entry_urls(article_json)
+        keys = [canonical_url(u) for u in urls]
+        dois = entry_dois(urls)
+        for key in keys:
+            if key in self._urls:
+                return self.entries[self._urls[key]], 'url'
+        for doi in dois:
+            if doi in self._dois:
+                return self.entries[self._dois[doi]], 'doi %s'%doi
+        sig = self.signature(title_words(article_json.get('title')))
+        if sig is not None:
+            for i in self.candidates(sig):
+                score = self.same_story(article_json, self.entries[i])
+                if score is not None:
+                    return self.entries[i], 'title %.2f'%score
+        self.entries[entry_id] = article_json
+        for key in keys:
+            self._urls.setdefault(key, entry_id)
+        for doi in dois:
+            self._dois.setdefault(doi, entry_id)
+        if sig is not None:
+            self._signatures[entry_id] = sig
+            for band in self._bands(sig):
+                self._buckets.setdefault(band, []).append(entry_id)
+        return None
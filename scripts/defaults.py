@@ -0,0 +1,22 @@
+# Defaults shared by the scripts and the command line. Kept free of
+# third-party imports so main.py can build its parser without loading them.
+
+# max concurrent connections to one publisher host
+MAX_PER_HOST = 2
+# articles rendered per intermediate pdf
+BATCH_SIZE = 20
+# wkhtmltopdf processes run at once
+WORKERS = 1
+# max image width in px, about 80% of the page width at 150 dpi
+MAX_WIDTH = 900
+# output backend: 'wkhtmltopdf', 'weasyprint' (pdf), 'html' or 'epub'
+RENDERER = 'wkhtmltopdf'
+# file extension per backend, html and epub skip the page layout
+EXTENSIONS = {
+    'wkhtmltopdf': '.pdf',
+    'weasyprint': '.pdf',
+    'html': '.html',
+    'epub': '.epub',
+}
+# days per window of a backfill, one output file each
+WINDOW = 1
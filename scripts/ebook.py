@@ -0,0 +1,152 @@
+import os
+import re
+import uuid
+import zipfile
+import mimetypes
+from html import escape
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import lxml.html
+from lxml import etree
+
+LOCAL_IMG_RE = re.compile(r'<img src="(file:[^"]+)"')
+XHTML = '''<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>%s</title><link rel="stylesheet" type="text/css" href="style.css"/></head>
+<body>%s</body>
+</html>'''
+CONTAINER = '''<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>'''
+OPF = '''<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="id">urn:uuid:%s</dc:identifier>
+<dc:title>%s</dc:title>
+<dc:language>en</dc:language>
+<meta property="dcterms:modified">%s</meta>
+</metadata>
+<manifest>
+<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+<item id="css" href="style.css" media-type="text/css"/>
+%s
+</manifest>
+<spine>
+%s
+</spine>
+</package>'''
+
+
+def read_css(css):
+    '''Read the css file
+
+    :param str css: path of css file, None for no style
+    :return str
+    '''
+    if not css:
+        return ''
+    with open(css, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def clean(content):
+    '''Drop the empty paragraphs left by parse_bs_page (as converter.to_html)
+
+    :param str content: article content
+    :return str
+    '''
+    return content.replace('<p></p><br>', '')
+
+
+def write_html(title, sections, out, css=None):
+    '''Write the articles to one html file, with the css inlined
+
+    :param str title: heading of the document
+    :param list sections: output of Converter.sections
+    :param str out: path of output html file
+    :param str css: path of css file
+    '''
+    parts = ['<h1>%s</h1>'%escape(title)]
+    if sections and sections[0][0] is not None:
+        parts.append('<ul>%s</ul>'%''.join('<li><a href="#s%s">%s</a></li>'%(n, escape(name))
+                                           for n, (name, _) in enumerate(sections)))
+    for n, (name, articles) in enumerate(sections):
+        if name is not None:
+            parts.append('<h1 id="s%s">%s</h1>'%(n, escape(name)))
+        parts.extend(clean(a.content) for a in articles)
+    # written piece by piece, the document is never built as one string
+    with open(out, 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html><html><head><meta charset="utf-8"><title>%s</title>'
+                '<style>%s</style></head><body>'%(escape(title), read_css(css)))
+        f.writelines(parts)
+        f.write('</body></html>')
+
+
+def to_xhtml(content):
+    '''Make article content well-formed for an epub chapter
+
+    :param str content: article content
+    :return str: xhtml fragment
+    '''
+    root = lxml.html.fragment_fromstring(clean(content), create_parent='div')
+    return etree.tostring(root, method='xml', encoding='unicode')
+
+
+def write_epub(title, sections, out, css=None):
+    '''Write the articles to an epub 3 file, one chapter per section
+
+    Images downloaded by ImageCache (file:// urls) are packed into the
+    book, remote images are left as links.
+
+    :param str title: heading of the document
+    :param list sections: output of Converter.sections
+    :param str out: path of output epub file
+    :param str css: path of css file
+    '''
+    images = {}
+
+    def pack_image(m):
+        path = url2pathname(urlparse(m.group(1)).path)
+        if not os.path.exists(path):
+            return m.group(0)
+        if path not in images:
+            images[path] = 'images/%s%s'%(len(images), os.path.splitext(path)[1])
+        return '<img src="%s"'%images[path]
+
+    chapters = []
+    nav = []
+    for n, (name, articles) in enumerate(sections):
+        name = name or title
+        body = ['<h1>%s</h1>'%escape(name)]
+        links = []
+        for k, a in enumerate(articles):
+            body.append('<div id="a%s">%s</div>'
+                        %(k, to_xhtml(LOCAL_IMG_RE.sub(pack_image, a.content))))
+            links.append('<li><a href="c%s.xhtml#a%s">%s</a></li>'%(n, k, escape(a.title)))
+        chapters.append(XHTML%(escape(name), ''.join(body)))
+        nav.append('<li><a href="c%s.xhtml">%s</a><ol>%s</ol></li>'%(n, escape(name), ''.join(links)))
+    manifest = ['<item id="c%s" href="c%s.xhtml" media-type="application/xhtml+xml"/>'%(n, n)
+                for n in range(len(chapters))]
+    for k, href in enumerate(images.values()):
+        media_type = mimetypes.guess_type(href)[0] or 'image/jpeg'
+        manifest.append('<item id="i%s" href="%s" media-type="%s"/>'%(k, href, media_type))
+    spine = ''.join('<itemref idref="c%s"/>'%n for n in range(len(chapters)))
+    modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as book:
+        # the mimetype comes first and uncompressed
+        book.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        book.writestr('META-INF/container.xml', CONTAINER)
+        book.writestr('OEBPS/content.opf', OPF%(uuid.uuid4(), escape(title), modified,
+                                                '\n'.join(manifest), spine))
+        book.writestr('OEBPS/nav.xhtml', XHTML%(escape(title),
+                      '<nav epub:type="toc"><h1>%s</h1><ol>%s</ol></nav>'
+                      %(escape(title), ''.join(nav))))
+        book.writestr('OEBPS/style.css', read_css(css))
+        for n, chapter in enumerate(chapters):
+            book.writestr('OEBPS/c%s.xhtml'%n, chapter)
+        for path, href in images.items():
+            book.write(path, 'OEBPS/' + href)
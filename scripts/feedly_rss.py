@@ -1,3 +1,4 @@
+import sys
 from datetime import datetime
 
 # pip install feedly-client
@@ -12,7 +13,9 @@ if TEST:
     MAX_RSS = 30
 else:
     BACKTRACKING = 24 # unit: hour
-    MAX_RSS = 150
+    MAX_RSS = sys.maxsize # no limit, newerThan ends the stream
+# entries per Feedly request (continuation page)
+PAGE_SIZE = 100
 
 class FeedlyRSS:
     '''Access RSS feed via Feedly token
@@ -20,7 +23,7 @@ class FeedlyRSS:
     
     :attr str token: Feedly token
     :attr str today: 13-digit timestamp = now - BACKTRACKING
-    :attr list article_json_list: a list to store Feedly stream contents
+    :attr FeedlySession sess: session kept open by open(), None otherwise
     '''
     def __init__(self, token_file):
         '''Initialization
@@ -29,21 +32,69 @@ class FeedlyRSS:
         '''
         with open(token_file, 'r') as f:
             self.token = f.read().strip()
+        self.refresh()
+        self.sess = None
+
+    def refresh(self):
+        '''Move today to now - BACKTRACKING, for instances used over several runs'''
         self.today = (datetime.now().timestamp() - 3600*BACKTRACKING)*1000
-        self.article_json_list = []
 
-    def get_rss(self, category):
-        '''Get Feedly stream contents
-        
+    def open(self):
+        '''Keep one Feedly session open for all following iter_pages calls'''
+        if self.sess is None:
+            self.sess = FeedlySession(auth=self.token)
+
+    def close(self):
+        '''Close the session kept open by open()'''
+        if self.sess is not None:
+            self.sess.close()
+            self.sess = None
+
+    def iter_stream(self, sess, category, newer_than=None):
+        '''Read one category over an open session, page by page
+
+        The stream is filtered server side with newerThan and followed
+        through its continuation tokens, so there is no fixed page limit.
+
+        :param FeedlySession sess: Feedly session
         :param str category: Feedly category code
-            can be found via FeedlySession(token).user.get_categories()
+        :param int newer_than: 13-digit timestamp, today if not given
+        :return generator: lists of Feedly stream contents (one per page)
         '''
+        if newer_than is None:
+            newer_than = self.today
         opts = StreamOptions(max_count=MAX_RSS)
+        opts.count = PAGE_SIZE
+        opts.newerThan = int(newer_than)
+        page = []
+        for con in sess.user.get_category(category).stream_contents(opts):
+            if con.json['published'] <= newer_than:
+                break
+            page.append(con.json)
+            if len(page) == PAGE_SIZE:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def iter_pages(self, categories, newer_than=None):
+        '''Read several categories over one session, page by page
+
+        :param list categories: Feedly category codes
+        :param dict newer_than: 13-digit timestamp per category code, today if missing
+        :return generator: (category code, list of Feedly stream contents)
+        '''
+        newer_than = newer_than or {}
+        if self.sess is not None:
+            yield from self._iter_pages(self.sess, categories, newer_than)
+            return
         with FeedlySession(auth=self.token) as sess:
-            for con in sess.user.get_category(category).stream_contents(opts):
-                if con.json['published'] > self.today:
-                    self.article_json_list.append(con.json)
-                else:
-                    break
-        l = len(self.article_json_list)
-        print('%s articles detected.'%l)
\ No newline at end of file
+            yield from self._iter_pages(sess, categories, newer_than)
+
+    def _iter_pages(self, sess, categories, newer_than):
+        for category in categories:
+            l = 0
+            for page in self.iter_stream(sess, category, newer_than.get(category)):
+                l += len(page)
+                yield category, page
+            print('%s articles detected in %s.'%(l, category))
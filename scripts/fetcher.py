@@ -0,0 +1,465 @@
+import re
+import time
+import asyncio
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# pip install httpx[http2] to fetch over HTTP/2
+try:
+    import httpx
+except ImportError:
+    httpx = None
+# gzip/deflate are always decoded, br needs pip install brotli
+
+from scripts.metrics import METRICS
+from scripts.defaults import MAX_PER_HOST
+
+HEADERS = {'User-Agent': 'GhostBrowser'}
+# hosts kept in the connection pool
+POOL_HOSTS = 50
+CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.I)
+# end of the <head>, where head-only reads stop
+HEAD_END = re.compile(rb'</head\s*>|<body[\s>]', re.I)
+# size of the chunks read by streamed requests
+CHUNK_SIZE = 16384
+
+
+def decode(content, content_type=None):
+    '''Decode a page with its declared charset, utf-8 otherwise
+
+    :param bytes content: response body
+    :param str content_type: Content-Type header
+    :return str: html string
+    '''
+    charset = None
+    if content_type and 'charset=' in content_type:
+        charset = content_type.split('charset=')[-1].split(';')[0].strip(' "\'')
+    if charset is None:
+        m = CHARSET_RE.search(content[:2048])
+        if m:
+            charset = m.group(1).decode('ascii')
+    try:
+        return content.decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+class FetchError(Exception):
+    '''A page could not be fetched'''
+    pass
+
+
+class CircuitOpen(FetchError):
+    '''The host failed too often recently, the page was not requested'''
+    pass
+
+
+class FetchPolicy:
+    '''Timeouts, retries and circuit breaker settings of a publisher
+
+    :attr float connect: connect timeout in seconds
+    :attr float read: read timeout in seconds
+    :attr int retries: extra attempts after a failed request
+    :attr float backoff: wait before the first retry, doubled after each retry
+    :attr int max_failures: failed fetches in a row that open the circuit
+    :attr float reset_after: seconds before an open circuit lets a request through
+    '''
+    def __init__(self, connect=5, read=30, retries=2, backoff=1.0,
+                 max_failures=3, reset_after=300):
+        self.connect = connect
+        self.read = read
+        self.retries = retries
+        self.backoff = backoff
+        self.max_failures = max_failures
+        self.reset_after = reset_after
+
+
+DEFAULT_POLICY = FetchPolicy()
+NETWORK_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx else ())
+
+
+class CircuitBreaker:
+    '''Fail fast on a host after repeated errors
+
+    Closed: requests go through. After policy.max_failures failed fetches
+    in a row the circuit opens and requests fail at once. After
+    policy.reset_after seconds one request is let through: success closes
+    the circuit, failure opens it again.
+
+    :attr FetchPolicy policy: settings of the host
+    :attr int failures: failed fetches in a row
+    :attr float opened: time the circuit opened, None if closed
+    '''
+    def __init__(self, policy):
+        self.policy = policy
+        self.failures = 0
+        self.opened = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        '''Whether a request may be sent
+
+        :return bool
+        '''
+        with self._lock:
+            if self.opened is None:
+                return True
+            if time.time() - self.opened >= self.policy.reset_after:
+                # half open: let one request through
+                self.opened = time.time()
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.policy.max_failures:
+                self.opened = time.time()
+
+
+class Fetcher:
+    '''Fetch publisher pages with a per-host connection limit
+
+    Pages can be fetched one by one (get) or many at once on an asyncio
+    event loop (prefetch). Prefetched pages are kept until get asks for
+    them, so the article classes do not need to know which path was used.
+    A get for a page still being prefetched waits for it, and a get for a
+    page whose prefetch failed raises the same FetchError rather than
+    going through the retries again. Pages never asked for are dropped by
+    discard at the end of a run.
+
+    Requests follow the FetchPolicy of their host (timeouts, retries with
+    exponential backoff and a circuit breaker), DEFAULT_POLICY if none was
+    set. They share one pooled keep-alive client (requests, or httpx over
+    HTTP/2 with http2), so repeated hosts skip the TCP/TLS handshake.
+
+    :attr int max_per_host: max concurrent connections to one host
+    :attr HttpCache cache: on-disk response cache, None to disable
+    :attr dict pages: prefetched pages (url: html string, or FetchError of a failed prefetch)
+    :attr dict policies: fetch policy per host
+    :attr bool http2: use HTTP/2 (needs httpx)
+    '''
+    def __init__(self, max_per_host=MAX_PER_HOST, cache=None, http2=False):
+        '''Initialization
+
+        :param int max_per_host: max concurrent connections to one host
+        :param HttpCache cache: on-disk response cache
+        :param bool http2: use HTTP/2 (needs httpx)
+        '''
+        self.max_per_host = max_per_host
+        self.cache = cache
+        self.http2 = http2
+        self._client = None
+        self.pages = {}
+        self._lock = threading.Lock()
+        self._host_sems = {}
+        self._inflight = {}
+        # bumped by discard, prefetches started before are not kept
+        self._generation = 0
+        self.policies = {}
+        self._breakers = {}
+
+    @staticmethod
+    def host(url):
+        '''Get the host name of a url
+
+        :param str url: url of page
+        :return str: host name
+        '''
+        return urlparse(url).netloc.lower()
+
+    def _host_sem(self, url):
+        with self._lock:
+            host = self.host(url)
+            if host not in self._host_sems:
+                self._host_sems[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_sems[host]
+
+    def client(self):
+        '''Get the shared HTTP client, created on first use
+
+        :return requests.Session or httpx.Client
+        :raise ImportError: http2 without httpx
+        '''
+        if self.http2 and httpx is None:
+            raise ImportError('HTTP/2 fetching needs pip install httpx[http2]')
+        with self._lock:
+            if self._client is None:
+                if self.http2:
+                    limits = httpx.Limits(max_connections=POOL_HOSTS*self.max_per_host,
+                                          max_keepalive_connections=POOL_HOSTS*self.max_per_host)
+                    self._client = httpx.Client(http2=True, limits=limits)
+                else:
+                    self._client = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=POOL_HOSTS,
+                                          pool_maxsize=self.max_per_host)
+                    self._client.mount('http://', adapter)
+                    self._client.mount('https://', adapter)
+            return self._client
+
+    def _send(self, url, headers, policy, until=None):
+        client = self.client()
+        if httpx is not None and isinstance(client, httpx.Client):
+            timeout = httpx.Timeout(policy.read, connect=policy.connect)
+            if until is None:
+                return client.get(url, headers=headers, timeout=timeout, follow_redirects=True)
+            with client.stream('GET', url, headers=headers, timeout=timeout,
+                               follow_redirects=True) as resp:
+                body = self._read_until(resp.iter_bytes(CHUNK_SIZE), until)
+            # iter_bytes already decoded the body, it must not be decoded again
+            headers = [(k, v) for k, v in resp.headers.multi_items()
+                       if k.lower() not in ('content-encoding', 'content-length')]
+            return httpx.Response(resp.status_code, headers=headers, content=body,
+                                  request=resp.request)
+        if until is None:
+            return client.get(url, headers=headers, timeout=(policy.connect, policy.read))
+        resp = client.get(url, headers=headers, timeout=(policy.connect, policy.read), stream=True)
+        try:
+            resp._content = self._read_until(resp.iter_content(CHUNK_SIZE), until)
+        finally:
+            # the rest of the body is never read, drop the connection
+            resp.close()
+        return resp
+
+    @staticmethod
+    def _read_until(chunks, until):
+        '''Read a streamed body until a pattern appears
+
+        :param iterator chunks: body chunks (bytes)
+        :param re.Pattern until: pattern ending the read
+        :return bytes: body read so far
+        '''
+        body = b''
+        for chunk in chunks:
+            start = max(0, len(body) - 64)
+            body += chunk
+            if until.search(body, start):
+                break
+        return body
+
+    def close(self):
+        '''Close the pooled connections'''
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def discard(self):
+        '''Drop the prefetched pages nobody asked for, and those still in flight'''
+        with self._lock:
+            self.pages.clear()
+            self._generation += 1
+
+    def set_policy(self, url, policy):
+        '''Set the fetch policy of the host of a url
+
+        :param str url: url of page
+        :param FetchPolicy policy: fetch policy
+        '''
+        with self._lock:
+            host = self.host(url)
+            self.policies[host] = policy
+            if host in self._breakers:
+                self._breakers[host].policy = policy
+
+    def _breaker(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.policies.get(host, DEFAULT_POLICY))
+            return self._breakers[host]
+
+    def http_get(self, url, headers=HEADERS, until=None):
+        '''Send a GET request following the host's fetch policy
+
+        Connection errors, timeouts, 429 and 5xx responses are retried;
+        other responses are returned as they are.
+
+        :param str url: url of page
+        :param dict headers: request headers
+        :param re.Pattern until: stop reading the body once it matches
+        :return requests.Response or httpx.Response
+        :raise FetchError: all attempts failed, or the circuit is open
+        '''
+        host = self.host(url)
+        breaker = self._breaker(host)
+        policy = breaker.policy
+        if not breaker.allow():
+            METRICS.inc('circuit_open', origin=host)
+            raise CircuitOpen('%s is failing, %s skipped'%(host, url))
+        for attempt in range(policy.retries + 1):
+            if attempt > 0:
+                METRICS.inc('retries', origin=host)
+                time.sleep(policy.backoff * 2**(attempt - 1))
+            try:
+                with METRICS.timer('fetch', host):
+                    resp = self._send(url, headers, policy, until)
+            except NETWORK_ERRORS as e:
+                error = e
+                continue
+            if resp.status_code == 429 or resp.status_code >= 500:
+                error = 'HTTP %s'%resp.status_code
+                continue
+            breaker.success()
+            METRICS.inc('bytes_downloaded', len(resp.content), host)
+            return resp
+        breaker.failure()
+        METRICS.inc('fetch_failed', origin=host)
+        raise FetchError('%s: %s'%(url, error))
+
+    def _request(self, url, until=None):
+        if self.cache is None:
+            resp = self.http_get(url, until=until)
+            return decode(resp.content, resp.headers.get('Content-Type'))
+        # partial bodies are cached apart from the full pages
+        key = url if until is None else 'head:' + url
+        entry = self.cache.get(key)
+        if entry is not None and entry['fresh']:
+            self.cache.used(key)
+            self.cache.count('hit', len(entry['body']))
+            return decode(entry['body'], entry.get('content_type'))
+        headers = dict(HEADERS)
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            resp = self.http_get(url, headers, until)
+        except FetchError:
+            if entry is None:
+                raise
+            # serve the stale copy rather than nothing
+            self.cache.count('hit', len(entry['body']))
+            return decode(entry['body'], entry.get('content_type'))
+        if entry is not None and resp.status_code == 304:
+            self.cache.touch(key)
+            self.cache.count('revalidated', len(entry['body']))
+            return decode(entry['body'], entry.get('content_type'))
+        self.cache.count('miss', len(resp.content))
+        if resp.status_code == 200:
+            self.cache.put(key, resp.content, resp.headers)
+        return decode(resp.content, resp.headers.get('Content-Type'))
+
+    def get(self, url):
+        '''Get a page, from the prefetched pages if possible (sync)
+
+        :param str url: url of page
+        :return str: html string
+        '''
+        with self._lock:
+            event = self._inflight.get(url)
+        if event is not None:
+            event.wait()
+        html = self._prefetched(url)
+        if html is not None:
+            return html
+        return self._limited(self._request, url)
+
+    def get_head(self, url):
+        '''Get the <head> of a page only, the rest of the body is not downloaded
+
+        A prefetched full page is used if there is one.
+
+        :param str url: url of page
+        :return str: html string, cut after </head>
+        '''
+        html = self._prefetched(url)
+        if html is not None:
+            return html
+        return self._limited(lambda u: self._request(u, HEAD_END), url)
+
+    def _prefetched(self, url):
+        '''Take a prefetched page
+
+        :param str url: url of page
+        :return str: html string, None if not prefetched
+        :raise FetchError: the prefetch failed
+        '''
+        with self._lock:
+            html = self.pages.pop(url, None)
+        if isinstance(html, FetchError):
+            raise html
+        return html
+
+    def _limited(self, func, url):
+        with self._host_sem(url):
+            return func(url)
+
+    async def aget(self, url, host_sems, func=None):
+        '''Get a page without blocking the event loop
+
+        :param str url: url of page
+        :param dict host_sems: asyncio semaphores (host: asyncio.Semaphore)
+        :param function func: blocking download function, _request by default
+        :return: result of func (html string by default)
+        '''
+        host = self.host(url)
+        if host not in host_sems:
+            host_sems[host] = asyncio.Semaphore(self.max_per_host)
+        async with host_sems[host]:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._limited, func or self._request, url)
+
+    async def _fetch_all(self, urls, func, done=None):
+        host_sems = {}
+        async def one(url):
+            try:
+                result = await self.aget(url, host_sems, func)
+            except Exception as e:
+                result = e
+            if done is not None:
+                done(url, result)
+            return result
+        return await asyncio.gather(*[one(url) for url in urls])
+
+    def fetch_all(self, urls, func=None):
+        '''Run a download function on many urls concurrently
+
+        :param list urls: unique urls
+        :param function func: blocking download function, _request by default
+        :return list: results in url order, exceptions are returned not raised
+        '''
+        if not urls:
+            return []
+        return asyncio.run(self._fetch_all(urls, func))
+
+    def prefetch(self, urls, wait=True):
+        '''Fetch pages concurrently and keep them for get
+
+        A page that failed for good (FetchError) is kept as its error, get
+        raises it, other failures are skipped and retried by get.
+
+        :param list urls: urls of pages (None is ignored)
+        :param bool wait: block until done, else prefetch in a background thread
+        '''
+        with self._lock:
+            urls = [u for u in dict.fromkeys(urls)
+                    if u and u not in self.pages and u not in self._inflight]
+            for url in urls:
+                self._inflight[url] = threading.Event()
+            generation = self._generation
+        if not urls:
+            return
+
+        def done(url, html):
+            with self._lock:
+                if isinstance(html, (str, FetchError)) and generation == self._generation:
+                    self.pages[url] = html
+                event = self._inflight.pop(url)
+            event.set()
+
+        if wait:
+            asyncio.run(self._fetch_all(urls, None, done))
+        else:
+            threading.Thread(target=asyncio.run, args=(self._fetch_all(urls, None, done),),
+                             daemon=True).start()
+
+FETCHER = Fetcher()
@@ -0,0 +1,93 @@
+import os
+import re
+import hashlib
+from io import BytesIO
+from urllib.parse import urlparse
+
+from scripts.fetcher import FETCHER
+from scripts.defaults import MAX_WIDTH
+
+# pip install Pillow to downscale images
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMG_RE = re.compile(r'<img src="([^"]+)"')
+
+class ImageCache:
+    '''Download article images to a local folder before rendering
+
+    Images are saved once per url (named after sha1 of the url), so the
+    same image used by several articles or runs is fetched once. With
+    Pillow installed, images wider than max_width are downscaled.
+
+    :attr str path: image folder
+    :attr int max_width: max image width in px, 0 to keep the original size
+    '''
+    def __init__(self, path, max_width=MAX_WIDTH):
+        '''Initialization
+
+        :param str path: image folder
+        :param int max_width: max image width in px, 0 to keep the original size
+        '''
+        os.makedirs(path, exist_ok=True)
+        self.path = os.path.abspath(path)
+        self.max_width = max_width
+
+    def local_path(self, url):
+        '''Get the local path of an image
+
+        :param str url: url of image
+        :return str: path of local file
+        '''
+        ext = os.path.splitext(urlparse(url).path)[1][:5] or '.img'
+        return os.path.join(self.path, hashlib.sha1(url.encode('utf-8')).hexdigest() + ext)
+
+    def download(self, url):
+        '''Download one image (blocking)
+
+        :param str url: url of image
+        :return str: path of local file
+        '''
+        path = self.local_path(url)
+        if os.path.exists(path):
+            return path
+        resp = FETCHER.http_get(url)
+        resp.raise_for_status()
+        data = resp.content
+        if Image is not None and self.max_width:
+            try:
+                img = Image.open(BytesIO(data))
+                if img.width > self.max_width:
+                    height = int(img.height * self.max_width / img.width)
+                    out = BytesIO()
+                    img.resize((self.max_width, height)).save(out, format=img.format)
+                    data = out.getvalue()
+            except (OSError, ValueError):
+                pass
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return path
+
+    def inline(self, article_list):
+        '''Download the images of all articles and point the html at them
+
+        Images that fail to download keep their remote url.
+
+        :param list article_list: list of Article classes
+        :return tuple: (number of local images, number of failed images)
+        '''
+        urls = []
+        for a in article_list:
+            urls.extend(IMG_RE.findall(a.content))
+        urls = list(dict.fromkeys(u for u in urls if u.startswith('http')))
+        results = FETCHER.fetch_all(urls, self.download)
+        local = {u: 'file:///' + p.replace(os.sep, '/').lstrip('/')
+                 for u, p in zip(urls, results) if isinstance(p, str)}
+        for a in article_list:
+            a.content = IMG_RE.sub(lambda m: '<img src="%s"'%local.get(m.group(1), m.group(1)),
+                                   a.content)
+        return len(local), len(urls) - len(local)
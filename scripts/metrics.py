@@ -0,0 +1,158 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# upper bounds of the latency histogram buckets, unit: second
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PREFIX = 'feedly2pdf'
+
+class Metrics:
+    '''Run metrics: latency histograms and counters per stage and origin
+
+    Stages are 'feedly', 'fetch', 'parse', 'scrape' and 'render'. The
+    origin is the Feedly source of the article, or the host for 'fetch'
+    which happens before the article is known.
+
+    METRICS adds up every run of the process (the /metrics page of the
+    service), the report of one run is the difference with a copy taken
+    when it started (since).
+
+    :attr dict hists: (stage, origin): {'buckets', 'count', 'sum'}
+    :attr dict counters: (name, origin): value
+    '''
+    def __init__(self):
+        self.hists = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, origin=''):
+        '''Record one latency
+
+        :param str stage: stage name
+        :param float seconds: latency
+        :param str origin: Feedly source or host
+        '''
+        with self._lock:
+            h = self.hists.setdefault((stage, origin),
+                                      {'buckets': [0]*len(BUCKETS), 'count': 0, 'sum': 0.0})
+            for k, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    h['buckets'][k] += 1
+            h['count'] += 1
+            h['sum'] += seconds
+
+    def inc(self, name, value=1, origin=''):
+        '''Increase a counter
+
+        :param str name: counter name, e.g. 'bytes_downloaded', 'failed_NoKey'
+        :param int value: increment
+        :param str origin: Feedly source or host
+        '''
+        with self._lock:
+            self.counters[(name, origin)] = self.counters.get((name, origin), 0) + value
+
+    def copy(self):
+        '''Copy of the metrics recorded so far
+
+        :return Metrics
+        '''
+        other = Metrics()
+        with self._lock:
+            other.hists = {k: {'buckets': list(h['buckets']), 'count': h['count'], 'sum': h['sum']}
+                           for k, h in self.hists.items()}
+            other.counters = dict(self.counters)
+        return other
+
+    def since(self, earlier):
+        '''Metrics recorded after a copy, e.g. those of one run in service mode
+
+        :param Metrics earlier: output of copy
+        :return Metrics
+        '''
+        run = self.copy()
+        for k, h in earlier.hists.items():
+            r = run.hists[k]
+            r['buckets'] = [n - m for n, m in zip(r['buckets'], h['buckets'])]
+            r['count'] -= h['count']
+            r['sum'] -= h['sum']
+            if r['count'] == 0:
+                del run.hists[k]
+        for k, v in earlier.counters.items():
+            run.counters[k] -= v
+            if run.counters[k] == 0:
+                del run.counters[k]
+        return run
+
+    @contextmanager
+    def timer(self, stage, origin=''):
+        '''Time a block of code
+
+        with METRICS.timer('render'):
+            ...
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, origin)
+
+    def to_dict(self):
+        '''Serialize the metrics
+
+        :return dict
+        '''
+        with self._lock:
+            return {'buckets': list(BUCKETS),
+                    'stages': [{'stage': s, 'origin': o, **h} for (s, o), h in self.hists.items()],
+                    'counters': [{'name': n, 'origin': o, 'value': v}
+                                 for (n, o), v in self.counters.items()]}
+
+    def to_prometheus(self):
+        '''Serialize the metrics in the Prometheus text format
+
+        :return str
+        '''
+        d = self.to_dict()
+        lines = ['# TYPE %s_stage_seconds histogram'%PREFIX]
+        for h in d['stages']:
+            labels = 'stage="%s",origin="%s"'%(h['stage'], h['origin'].replace('"', '\\"'))
+            for bound, n in zip(BUCKETS, h['buckets']):
+                lines.append('%s_stage_seconds_bucket{%s,le="%s"} %s'%(PREFIX, labels, bound, n))
+            lines.append('%s_stage_seconds_bucket{%s,le="+Inf"} %s'%(PREFIX, labels, h['count']))
+            lines.append('%s_stage_seconds_sum{%s} %s'%(PREFIX, labels, h['sum']))
+            lines.append('%s_stage_seconds_count{%s} %s'%(PREFIX, labels, h['count']))
+        names = sorted({c['name'] for c in d['counters']})
+        for name in names:
+            lines.append('# TYPE %s_%s_total counter'%(PREFIX, name))
+            for c in d['counters']:
+                if c['name'] == name:
+                    lines.append('%s_%s_total{origin="%s"} %s'
+                                 %(PREFIX, name, c['origin'].replace('"', '\\"'), c['value']))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        '''Write the report, Prometheus textfile if path ends with .prom else json
+
+        :param str path: path of the report
+        '''
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    def summary(self):
+        '''Per-stage totals for the run log
+
+        :return str
+        '''
+        stages = {}
+        with self._lock:
+            for (s, _), h in self.hists.items():
+                n, t = stages.get(s, (0, 0.0))
+                stages[s] = (n + h['count'], t + h['sum'])
+        return 'Stages: ' + ', '.join('%s %s x %.2fs'%(s, n, t) for s, (n, t) in stages.items())
+
+
+METRICS = Metrics()
@@ -0,0 +1,187 @@
+import re
+
+import lxml.etree
+import lxml.html
+
+# separators of the names in a Feedly author field
+NAMES_RE = re.compile(r'\s*(?:;|&|\band\b)\s*')
+
+
+def reverse_name(name):
+    '''Turn 'Last, First' into 'First Last'
+
+    :param str name: author name
+    :return str
+    '''
+    return ' '.join(name.split(', ')[::-1])
+
+
+def split_names(text):
+    '''Split a Feedly author field into names
+
+    'Adams, Zoe; Cole, Ben', 'Zoe Adams, Ben Cole' and 'Zoe Adams and Ben
+    Cole' give two names each, a single 'Adams, Zoe' is one name.
+
+    :param str text: Feedly author field
+    :return list
+    '''
+    names = []
+    for part in NAMES_RE.split(text.strip()):
+        pieces = [p.strip() for p in part.split(',')]
+        # 'Last, First' has one comma and a one word last name
+        if len(pieces) > 2 or (len(pieces) == 2 and ' ' in pieces[0] and ' ' in pieces[1]):
+            names.extend(pieces)
+        else:
+            names.append(part)
+    return [n for n in names if n]
+
+
+def parse_tree(html):
+    '''Parse a page for Rules.extract
+
+    An empty (or comment only) page gives an empty document, its fields
+    are then missing like on any page without them.
+
+    :param str html: html string
+    :return lxml.html.HtmlElement: document root
+    '''
+    # lxml refuses str input with an xml encoding declaration
+    if html.lstrip().startswith('<?xml'):
+        html = html.split('?>', 1)[-1]
+    try:
+        return lxml.html.document_fromstring(html)
+    except lxml.etree.ParserError:
+        return lxml.html.document_fromstring('<html></html>')
+
+
+class Rule:
+    '''Where one field of a page is and how to read it
+
+    Elements are matched like bs4 find: a single class name matches any
+    element having that class, several (space separated) match the whole
+    class attribute.
+
+    :attr str tag: tag name
+    :attr dict attrs: attributes of the element, e.g. {'name': 'citation_title'}
+    :attr get: 'text', the name of the attribute holding the value, or a function(element)
+    :attr bool many: collect every match (e.g. authors), else keep the first
+    :attr str children: read the value(s) from these descendants of the match
+    :attr function fmt: applied to each value
+    :attr function join: turns the values of a many rule into one string
+    '''
+    def __init__(self, tag, attrs=None, get='content', many=False, children=None,
+                 fmt=None, join=', '.join):
+        '''Initialization
+
+        :param str tag: tag name
+        :param dict attrs: attributes of the element
+        :param get: 'text', attribute name or function(element)
+        :param bool many: collect every match
+        :param str children: read the values from these descendants
+        :param function fmt: applied to each value
+        :param function join: turns the values of a many rule into one string
+        '''
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.get = get
+        self.many = many
+        self.children = children
+        self.fmt = fmt
+        self.join = join
+        # (attribute, value, match one class name)
+        self._tests = [(k, v, k == 'class' and ' ' not in v) for k, v in self.attrs.items()]
+
+    def matches(self, el):
+        '''Whether an element of the right tag is the one described
+
+        :param lxml.html.HtmlElement el: element
+        :return bool
+        '''
+        for k, v, token in self._tests:
+            value = el.get(k)
+            if value is None:
+                return False
+            if token:
+                if v not in value.split():
+                    return False
+            elif value != v:
+                return False
+        return True
+
+    def read(self, el):
+        '''Read the value of a matched element
+
+        :param lxml.html.HtmlElement el: element
+        :return str
+        :raise KeyError: the element lacks the attribute
+        '''
+        if callable(self.get):
+            value = self.get(el)
+        elif self.get == 'text':
+            value = el.text_content()
+        else:
+            value = el.attrib[self.get]
+        return self.fmt(value) if self.fmt is not None else value
+
+    def values(self, el):
+        '''Read the values of a matched element
+
+        :param lxml.html.HtmlElement el: element
+        :return list
+        '''
+        if self.children is None:
+            return [self.read(el)]
+        return [self.read(c) for c in el.iter(self.children)]
+
+
+class Rules:
+    '''Declarative extraction spec of a publisher page
+
+    Rules(title=Rule('meta', {'name': 'citation_title'}),
+          authors=Rule('meta', {'name': 'citation_author'}, many=True))
+
+    The rules are grouped by tag once, then extract walks the document
+    a single time and hands every element to the rules of its tag,
+    instead of one find/find_all scan per field.
+
+    :attr dict fields: field name: Rule
+    :attr tuple tags: tag names looked at
+    '''
+    def __init__(self, **fields):
+        '''Initialization
+
+        :param Rule fields: one rule per field
+        '''
+        self.fields = fields
+        self._by_tag = {}
+        for name, rule in fields.items():
+            self._by_tag.setdefault(rule.tag, []).append((name, rule))
+        self.tags = tuple(self._by_tag)
+        self._singles = sum(not rule.many for rule in fields.values())
+        self._many = any(rule.many for rule in fields.values())
+
+    def extract(self, doc):
+        '''Read every field of a page in one pass
+
+        :param lxml.html.HtmlElement doc: output of parse_tree
+        :return dict: field name: str, fields without a match are missing
+            (many rules give '' instead)
+        '''
+        found = {}
+        collected = {name: [] for name, rule in self.fields.items() if rule.many}
+        for el in doc.iter(*self.tags):
+            for name, rule in self._by_tag[el.tag]:
+                if (name in found) or not rule.matches(el):
+                    continue
+                if rule.many:
+                    collected[name].extend(rule.values(el))
+                elif rule.children is not None:
+                    found[name] = rule.join(rule.values(el))
+                else:
+                    found[name] = rule.read(el)
+            # nothing left to look for
+            if not self._many and len(found) == self._singles:
+                break
+        for name, values in collected.items():
+            found[name] = self.fields[name].join(values)
+        return found
@@ -0,0 +1,69 @@
+import os
+import sqlite3
+from datetime import datetime
+
+
+class SeenIndex:
+    '''Local index of Feedly entries already rendered, per category
+
+    :attr str path: path of the SQLite database
+    :attr sqlite3.Connection conn: database connection
+    '''
+    def __init__(self, path):
+        '''Initialization
+
+        :param str path: path of the SQLite database
+        '''
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS seen ('
+                          'category TEXT, entry_id TEXT, processed INTEGER, '
+                          'PRIMARY KEY (category, entry_id))')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS runs ('
+                          'category TEXT PRIMARY KEY, last_run INTEGER)')
+        self.conn.commit()
+
+    def seen_ids(self, category):
+        '''Get the entries already processed for the category
+
+        :param str category: Feedly category code
+        :return set: Feedly entry ids
+        '''
+        rows = self.conn.execute('SELECT entry_id FROM seen WHERE category = ?', (category,))
+        return {r[0] for r in rows}
+
+    def mark(self, category, entry_ids):
+        '''Record entries as processed
+
+        :param str category: Feedly category code
+        :param list entry_ids: Feedly entry ids
+        '''
+        now = int(datetime.now().timestamp() * 1000)
+        self.conn.executemany('INSERT OR REPLACE INTO seen VALUES (?, ?, ?)',
+                              [(category, i, now) for i in entry_ids])
+        self.conn.commit()
+
+    def last_run(self, category):
+        '''Get the start time of the last successful run
+
+        :param str category: Feedly category code
+        :return int: 13-digit timestamp, None if never run
+        '''
+        row = self.conn.execute('SELECT last_run FROM runs WHERE category = ?',
+                                (category,)).fetchone()
+        return row[0] if row else None
+
+    def set_last_run(self, category, timestamp):
+        '''Record the start time of a successful run
+
+        :param str category: Feedly category code
+        :param int timestamp: 13-digit timestamp
+        '''
+        self.conn.execute('INSERT OR REPLACE INTO runs VALUES (?, ?)', (category, int(timestamp)))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import threading
+import mimetypes
+import traceback
+from datetime import datetime
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from scripts.metrics import METRICS
+
+HOST = '127.0.0.1'
+PORT = 8600
+# refresh interval of a category without its own, unit: minute
+EVERY = 60
+# how often the scheduler looks for due categories, unit: second
+TICK = 5
+
+
+def parse_schedule(every, names):
+    '''Parse the refresh intervals given on the command line
+
+    :param str every: minutes for all categories ('60'), or per category ('daily=30,econ=240')
+    :param list names: category names
+    :return dict: category name: interval in minutes
+    '''
+    schedule = dict.fromkeys(names, float(EVERY))
+    for item in every.split(','):
+        if '=' in item:
+            name, minutes = item.split('=', 1)
+            if name.strip() not in schedule:
+                raise ValueError('%s is not a served category'%name.strip())
+            schedule[name.strip()] = float(minutes)
+        else:
+            schedule = dict.fromkeys(names, float(item))
+    return schedule
+
+
+class Service:
+    '''Resident mode: refresh categories on a schedule and serve the latest pdfs
+
+    The process stays up, so the pooled HTTP client, the http cache, the
+    article store and the Feedly session are reused by every refresh. Runs
+    are serialized; a pdf is built next to its final path and moved in
+    place once written, so a request never gets a half-written file.
+
+    GET /                 status of every category (json)
+    GET /<category>       latest pdf, built first if there is none yet
+    GET /metrics          metrics of all runs (Prometheus text format)
+
+    :attr function build: build(category name, output path), one run
+    :attr dict schedule: category name: refresh interval in minutes
+    :attr dict outs: category name: path of the served pdf
+    :attr dict status: category name: {'last_run', 'next_run', 'error'}
+    '''
+    def __init__(self, build, schedule, outs):
+        '''Initialization
+
+        :param function build: build(category name, output path), one run
+        :param dict schedule: category name: refresh interval in minutes
+        :param dict outs: category name: path of the served pdf
+        '''
+        self.build = build
+        self.schedule = schedule
+        self.outs = outs
+        now = time.time()
+        self.status = {name: {'last_run': None, 'next_run': now, 'error': None}
+                       for name in schedule}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def refresh(self, name):
+        '''Build the pdf of a category now
+
+        :param str name: category name
+        :return bool: whether a new pdf was written
+        '''
+        out = self.outs[name]
+        tmp = '%s.tmp%s'%os.path.splitext(out)
+        with self._lock:
+            status = self.status[name]
+            start = time.time()
+            status['next_run'] = start + 60*self.schedule[name]
+            try:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                with METRICS.timer('refresh', name):
+                    self.build(name, tmp)
+                status['error'] = None
+            except Exception as e:
+                traceback.print_exc()
+                status['error'] = '%s: %s'%(e.__class__.__name__, e)
+                METRICS.inc('refresh_failed', origin=name)
+                return False
+            status['last_run'] = start
+            # incremental runs without new articles write nothing
+            if not os.path.exists(tmp):
+                return False
+            os.replace(tmp, out)
+            return True
+
+    def run_schedule(self):
+        '''Refresh the categories when due, until stop'''
+        while not self._stop.is_set():
+            for name in self.schedule:
+                if self._stop.is_set():
+                    break
+                if time.time() >= self.status[name]['next_run']:
+                    print('%s Refreshing %s.'%(datetime.now().strftime('%Y-%m-%d %H:%M:%S'), name))
+                    self.refresh(name)
+            self._stop.wait(TICK)
+
+    def latest(self, name):
+        '''Path of the latest pdf of a category, built first if there is none
+
+        :param str name: category name
+        :return str: path, None if it could not be built
+        '''
+        if not os.path.exists(self.outs[name]):
+            self.refresh(name)
+        return self.outs[name] if os.path.exists(self.outs[name]) else None
+
+    def state(self):
+        '''Status of every category
+
+        :return dict
+        '''
+        def iso(t):
+            return datetime.fromtimestamp(t).isoformat(timespec='seconds') if t else None
+        return {name: {'every': self.schedule[name],
+                       'pdf': self.outs[name] if os.path.exists(self.outs[name]) else None,
+                       'last_run': iso(s['last_run']),
+                       'next_run': iso(s['next_run']),
+                       'error': s['error']}
+                for name, s in self.status.items()}
+
+    def serve(self, host=HOST, port=PORT):
+        '''Run the scheduler and the HTTP endpoint until interrupted
+
+        :param str host: address to listen on
+        :param int port: port to listen on
+        '''
+        handler = type('Handler', (ServiceHandler,), {'service': self})
+        httpd = ThreadingHTTPServer((host, port), handler)
+        scheduler = threading.Thread(target=self.run_schedule, daemon=True)
+        scheduler.start()
+        print('Serving %s on http://%s:%s/'%(', '.join(self.schedule), host, port))
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stop.set()
+            httpd.server_close()
+            scheduler.join()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        # /daily and /daily.pdf (or .epub, .html) are the same
+        name = os.path.splitext(urlparse(self.path).path.strip('/'))[0]
+        if name == '':
+            self.send_body(200, 'application/json',
+                           json.dumps(self.service.state(), indent=2).encode('utf-8'))
+        elif name == 'metrics':
+            self.send_body(200, 'text/plain; version=0.0.4',
+                           METRICS.to_prometheus().encode('utf-8'))
+        elif name in self.service.schedule:
+            path = self.service.latest(name)
+            if path is None:
+                self.send_body(503, 'text/plain', b'pdf could not be built, see /')
+                return
+            with open(path, 'rb') as f:
+                self.send_body(200, mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                               f.read())
+        else:
+            self.send_body(404, 'text/plain', b'unknown category')
+
+    def send_body(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,74 @@
+import os
+import json
+import hashlib
+
+from scripts.articles import Articles, PARSER_VERSION
+
+
+class FragmentStore:
+    '''On-disk store of parsed articles
+
+    Articles are saved as json files named after sha1(entry id + parser
+    version), so a parser change never serves stale fragments. A manifest
+    per category keeps the entry ids of the last run in Feedly order, which
+    is enough to render the PDF again without scraping.
+
+    :attr str path: store directory
+    '''
+    def __init__(self, path):
+        '''Initialization
+
+        :param str path: store directory
+        '''
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def _path(self, entry_id):
+        key = hashlib.sha1(('%s:%s'%(entry_id, PARSER_VERSION)).encode('utf-8')).hexdigest()
+        return os.path.join(self.path, key + '.json')
+
+    @staticmethod
+    def _write(path, obj):
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+
+    def save(self, article):
+        '''Save a parsed article
+
+        :param Articles article: parsed article
+        '''
+        self._write(self._path(article.entry_id), article.to_dict())
+
+    def load(self, entry_id):
+        '''Load a parsed article
+
+        :param str entry_id: Feedly entry id
+        :return Articles: None if not stored
+        '''
+        try:
+            with open(self._path(entry_id), 'r', encoding='utf-8') as f:
+                return Articles.from_dict(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def save_manifest(self, category, entry_ids):
+        '''Save the entry ids of a run
+
+        :param str category: Feedly category code
+        :param list entry_ids: Feedly entry ids in Feedly order
+        '''
+        self._write(os.path.join(self.path, 'manifest_%s.json'%category), entry_ids)
+
+    def load_manifest(self, category):
+        '''Load the entry ids of the last run
+
+        :param str category: Feedly category code
+        :return list: Feedly entry ids, empty if never saved
+        '''
+        try:
+            with open(os.path.join(self.path, 'manifest_%s.json'%category), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
@@ -0,0 +1,57 @@
+import copy
+
+import pytest
+
+import main
+from scripts.articles import AEAPapers, InformsPapers, article_factory
+from scripts.fetcher import FETCHER
+from bench.common import load_stream
+
+
+@pytest.fixture
+def feed_entry():
+    entry, = [e for e in load_stream() if e['id'] == 'fixture/aea-feed']
+    return entry
+
+
+def test_paper_from_feed(feed_entry, monkeypatch):
+    def fetch(*args, **kwargs):
+        raise AssertionError('the landing page was fetched')
+    monkeypatch.setattr(FETCHER, 'get', fetch)
+    article_cls, _ = article_factory(feed_entry)
+    assert article_cls is AEAPapers and article_cls.prefetch_url(feed_entry) is None
+    paper = article_cls()
+    paper.get_content(feed_entry)
+    assert paper.origin == 'Zoe Adams, Ben Cole'
+    assert paper.published == 'American Economic Review'
+    assert feed_entry['summary']['content'] in paper.content
+
+
+@pytest.mark.parametrize('end', [' […]', '…', '...', ' [...]'])
+def test_truncated_summary(feed_entry, end):
+    entry = copy.deepcopy(feed_entry)
+    entry['summary']['content'] = entry['summary']['content'][:-1] + end
+    assert AEAPapers.feed_abstract(entry) is None
+    assert AEAPapers.prefetch_url(entry) == entry['canonicalUrl']
+
+
+@pytest.mark.parametrize('author, origin', [
+    ('Adams, Zoe; Cole, Ben', 'Zoe Adams, Ben Cole'),
+    ('Zoe Adams, Ben Cole', 'Zoe Adams, Ben Cole'),
+    ('Zoe Adams and Ben Cole', 'Zoe Adams, Ben Cole'),
+    ('Adams, Zoe', 'Zoe Adams'),
+])
+def test_feed_authors(author, origin):
+    assert AEAPapers.feed_authors(author) == origin
+
+
+def test_feed_authors_fmt():
+    assert InformsPapers.feed_authors('Zoe  Adams; Ben Cole') == 'Zoe Adams, Ben Cole'
+
+
+@pytest.mark.parametrize('html', ['', '<!-- empty -->'])
+def test_empty_page(html):
+    entry, = [e for e in load_stream() if e['id'] == 'fixture/wiley']
+    FETCHER.pages[entry['canonicalUrl']] = html
+    article_obj, log, _ = main.scrape(entry)
+    assert article_obj is None and 'failed (NoKey)' in log
@@ -0,0 +1,45 @@
+import pytest
+from datetime import date, datetime, time, timedelta
+
+from scripts.backfill import BackfillRSS, parse_range, windows, window_key, to_ms
+
+
+class StreamRSS:
+    '''Stand-in for FeedlyRSS, one page of entries per category'''
+    def __init__(self, entries):
+        self.entries = entries
+
+    def iter_pages(self, categories, newer_than=None):
+        for category in categories:
+            yield category, [e for e in self.entries if e['published'] > newer_than[category]]
+
+
+def test_out_of_order_entries():
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 5)
+    plan = {window_key('cat', label): ('cat', w_start, w_end)
+            for label, w_start, w_end in windows(start, end, 1)}
+    days = [4, 4, 3, 1, 3, 2, 2, 1]
+    entries = [{'id': str(k), 'published': to_ms(datetime(2024, 1, day, 12))}
+               for k, day in enumerate(days)]
+    pages = list(BackfillRSS(StreamRSS(entries), plan).iter_pages(list(plan)))
+    assert [key for key, _ in pages] == ['cat@20240104', 'cat@20240103', 'cat@20240102', 'cat@20240101']
+    assert [[e['id'] for e in page] for _, page in pages] == [['0', '1'], ['2', '4'], ['5', '6'], ['3', '7']]
+
+
+def test_done_windows_dropped():
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 4)
+    plan = {window_key('cat', label): ('cat', w_start, w_end)
+            for label, w_start, w_end in windows(start, end, 1) if label != '20240102'}
+    entries = [{'id': str(day), 'published': to_ms(datetime(2024, 1, day, 12))} for day in (3, 2, 1)]
+    pages = list(BackfillRSS(StreamRSS(entries), plan).iter_pages(list(plan)))
+    assert [(key, [e['id'] for e in page]) for key, page in pages] == \
+        [('cat@20240103', ['3']), ('cat@20240101', ['1'])]
+
+
+def test_range_ends_before_today():
+    today = datetime.combine(date.today(), time())
+    assert parse_range('2024-01-01') == (datetime(2024, 1, 1), today)
+    assert parse_range('2024-01-01,2024-01-31') == (datetime(2024, 1, 1), datetime(2024, 2, 1))
+    with pytest.raises(ValueError):
+        parse_range('2024-01-01,%s'%today.strftime('%Y-%m-%d'))
+    assert windows(*parse_range((today - timedelta(days=3)).strftime('%Y-%m-%d')))[0][2] == today
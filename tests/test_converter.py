@@ -0,0 +1,29 @@
+from pypdf import PdfWriter
+
+from scripts import converter
+from scripts.articles import ForbesArticles
+
+
+def fake_render(wkhtmltopdf, css, content, out, options=None):
+    if 'FAIL' in content:
+        return False
+    writer = PdfWriter()
+    writer.add_blank_page(100, 100)
+    with open(out, 'wb') as f:
+        writer.write(f)
+    return True
+
+
+def article(k, content):
+    a = ForbesArticles()
+    a.entry_id, a.content = 'entry/%s'%k, content
+    return a
+
+
+def test_failed_batch_ids(tmp_path, monkeypatch):
+    monkeypatch.setitem(converter.RENDERERS, 'wkhtmltopdf', fake_render)
+    cvt = converter.Converter(None, str(tmp_path / 'out.pdf'), batch_size=2, workers=1)
+    for k, content in enumerate(['<p>a</p>', '<p>b</p>', '<p>FAIL</p>', '<p>c</p>', '<p>d</p>']):
+        cvt.add(article(k, content))
+    assert cvt.end() == ['entry/2', 'entry/3']
+    assert (tmp_path / 'out.pdf').exists()
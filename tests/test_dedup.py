@@ -0,0 +1,69 @@
+import pytest
+
+from scripts.dedup import Deduper
+
+AUTHORS = 'Anna Doe, John Smith'
+
+
+def entry(entry_id, title, author=AUTHORS, url=None):
+    return {'id': entry_id, 'title': title, 'author': author,
+            'alternate': [{'href': url or 'https://example.com/%s'%entry_id}]}
+
+
+@pytest.mark.parametrize('first, second', [
+    ('The Effects of Minimum Wages on Employment: Evidence from Germany',
+     'The Effects of Minimum Wages on Employment: Evidence from France'),
+    ('Monetary Policy and the Housing Market, Part I',
+     'Monetary Policy and the Housing Market, Part II'),
+    ('Trade Shocks and Local Labor Markets in the United States',
+     'Trade Shocks and Local Labor Markets in the United States: Reply'),
+    ('The Effects of Minimum Wages on Low-Wage Jobs',
+     'The Effect of Minimum Wages on Low-Wage Jobs: Comment'),
+])
+def test_near_miss_titles_kept(first, second):
+    deduper = Deduper()
+    assert deduper.add(entry('a', first)) is None
+    assert deduper.add(entry('b', second)) is None
+
+
+def test_close_titles_of_other_authors_kept():
+    deduper = Deduper()
+    assert deduper.add(entry('a', 'Household Debt and the Great Recession in Europe')) is None
+    assert deduper.add(entry('b', 'Household Debts and the Great Recession in Europe',
+                             author='Maria Rossi')) is None
+    assert deduper.add(entry('c', 'Household Debt and the Great Recession in Europe.',
+                             author='Maria Rossi')) is None
+
+
+def test_same_story():
+    deduper = Deduper()
+    kept = entry('a', 'Social Networks and the Decision to Insure: Evidence from Randomized Experiments')
+    assert deduper.add(kept) is None
+    # case and punctuation only
+    assert deduper.add(entry('b', 'Social networks and the decision to insure - evidence from '
+                                  'randomized experiments.', author=None)) == (kept, 'title 1.00')
+    # spelling, same authors written otherwise
+    dup = deduper.add(entry('c', 'Social Networks and the Decision to Insure: Evidence from '
+                                 'Randomised Experiments', author='J. Smith, A. Doe'))
+    assert dup is not None and dup[0] is kept
+
+
+def test_url_and_doi():
+    deduper = Deduper()
+    kept = entry('a', 'Editorial', url='https://doi.org/10.1257/aer.20201234?utm_source=rss')
+    assert deduper.add(kept) is None
+    assert deduper.add(entry('b', 'Editorial', url='https://doi.org/10.1257/aer.20201234')) == (kept, 'url')
+    assert deduper.add(entry('c', 'Other', url='https://www.aeaweb.org/doi/10.1257/aer.20201234')) \
+        == (kept, 'doi 10.1257/aer.20201234')
+
+
+def test_same_title_other_papers_kept():
+    deduper = Deduper()
+    title = 'Introduction to the Special Issue'
+    assert deduper.add(entry('jm', title, author='Anna Doe',
+                             url='https://journals.sagepub.com/doi/10.1177/00222429211001')) is None
+    # other DOI
+    assert deduper.add(entry('isr', title, author='Anna Doe',
+                             url='https://pubsonline.informs.org/doi/10.1287/isre.2021.1001')) is None
+    # other authors
+    assert deduper.add(entry('ms', title, author='Carl Roe')) is None
@@ -0,0 +1,151 @@
+import gzip
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from scripts.fetcher import Fetcher, FetchError, FetchPolicy, CircuitBreaker, CircuitOpen, httpx
+
+PAGE = ('<html><head><meta name="citation_title" content="Title"></head><body>%s</body></html>'
+        %('<p>body</p>'*20000)).encode('utf-8')
+
+
+class GzipHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = gzip.compress(PAGE)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FailingHandler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        FailingHandler.hits += 1
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def failing_url():
+    FailingHandler.hits = 0
+    server = serve(FailingHandler)
+    yield 'http://127.0.0.1:%s/page.html'%server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gzip_url():
+    server = serve(GzipHandler)
+    yield 'http://127.0.0.1:%s/page.html'%server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('http2', [False, pytest.param(True, marks=pytest.mark.skipif(
+    httpx is None, reason='needs httpx'))])
+def test_get_head_gzip(gzip_url, http2):
+    fetcher = Fetcher(http2=http2)
+    try:
+        head = fetcher.get_head(gzip_url)
+    finally:
+        fetcher.close()
+    assert 'citation_title' in head
+    assert len(head) < len(PAGE)
+
+
+def test_discard(gzip_url):
+    fetcher = Fetcher()
+    try:
+        fetcher.prefetch([gzip_url])
+        assert gzip_url in fetcher.pages
+        fetcher.discard()
+        assert fetcher.pages == {}
+        # a prefetch still in flight is not kept either
+        fetcher.prefetch([gzip_url], wait=False)
+        fetcher.discard()
+        with fetcher._lock:
+            event = fetcher._inflight.get(gzip_url)
+        if event is not None:
+            event.wait()
+        assert fetcher.pages == {}
+    finally:
+        fetcher.close()
+
+
+def test_http2_needs_httpx(monkeypatch):
+    monkeypatch.setattr('scripts.fetcher.httpx', None)
+    with pytest.raises(ImportError):
+        Fetcher(http2=True).client()
+
+
+def test_failed_prefetch_not_fetched_again(failing_url):
+    fetcher = Fetcher()
+    fetcher.set_policy(failing_url, FetchPolicy(retries=1, backoff=0, max_failures=10))
+    try:
+        fetcher.prefetch([failing_url])
+        assert FailingHandler.hits == 2
+        with pytest.raises(FetchError):
+            fetcher.get(failing_url)
+        assert FailingHandler.hits == 2
+        # the error is used once, a later get fetches again
+        with pytest.raises(FetchError):
+            fetcher.get(failing_url)
+        assert FailingHandler.hits == 4
+    finally:
+        fetcher.close()
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(FetchPolicy(max_failures=2, reset_after=0.05))
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    # open
+    assert not breaker.allow()
+    time.sleep(0.06)
+    # half open: one request through, failing opens the circuit again
+    assert breaker.allow() and not breaker.allow()
+    breaker.failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    # success closes it
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.allow() and breaker.allow()
+    breaker.failure()
+    assert breaker.allow()
+
+
+def test_circuit_open(failing_url):
+    fetcher = Fetcher()
+    fetcher.set_policy(failing_url, FetchPolicy(retries=0, max_failures=2))
+    try:
+        for _ in range(2):
+            with pytest.raises(FetchError):
+                fetcher.get(failing_url)
+        with pytest.raises(CircuitOpen):
+            fetcher.get(failing_url)
+        assert FailingHandler.hits == 2
+    finally:
+        fetcher.close()
@@ -0,0 +1,33 @@
+import sys
+import importlib.util
+
+import pytest
+
+import main
+
+
+def test_http2_needs_httpx(monkeypatch, capsys):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, 'find_spec', lambda name: None if name == 'h2' else find_spec(name))
+    monkeypatch.setattr(sys, 'argv', ['main.py', '--http2'])
+    with pytest.raises(SystemExit):
+        main.cmd_parser()
+    assert 'httpx[http2]' in capsys.readouterr().err
+
+
+def test_weasyprint_needed(monkeypatch, capsys):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, 'find_spec',
+                        lambda name: None if name == 'weasyprint' else find_spec(name))
+    monkeypatch.setattr(sys, 'argv', ['main.py', '-r', 'weasyprint'])
+    with pytest.raises(SystemExit):
+        main.cmd_parser()
+    assert 'pip install weasyprint' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('text', ['2024-13-01', '2024-01-05,2024-01-01', '2024-01-01,2999-01-01'])
+def test_backfill_range_checked(monkeypatch, capsys, text):
+    monkeypatch.setattr(sys, 'argv', ['main.py', '--backfill', text])
+    with pytest.raises(SystemExit):
+        main.cmd_parser()
+    assert '--backfill' in capsys.readouterr().err
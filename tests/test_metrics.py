@@ -0,0 +1,27 @@
+from scripts.metrics import Metrics
+
+
+def test_since():
+    metrics = Metrics()
+    metrics.observe('scrape', 0.2, 'a')
+    metrics.inc('done', origin='a')
+    start = metrics.copy()
+    metrics.observe('scrape', 3, 'a')
+    metrics.observe('render', 1)
+    metrics.inc('done', origin='a')
+    metrics.inc('done', origin='a')
+    run = metrics.since(start)
+    assert run.hists[('scrape', 'a')]['count'] == 1 and run.hists[('scrape', 'a')]['sum'] == 3
+    assert run.hists[('render', '')]['count'] == 1
+    assert run.counters == {('done', 'a'): 2}
+    # the copy and the totals are left as they are
+    assert start.counters == {('done', 'a'): 1}
+    assert metrics.hists[('scrape', 'a')]['count'] == 2
+
+
+def test_since_drops_idle():
+    metrics = Metrics()
+    metrics.observe('scrape', 0.2, 'a')
+    metrics.inc('done', origin='a')
+    run = metrics.since(metrics.copy())
+    assert run.hists == {} and run.counters == {}
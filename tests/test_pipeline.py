@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import main
+from scripts.fetcher import FETCHER
+from scripts.metrics import METRICS
+from scripts.seen import SeenIndex
+from bench.common import FixtureServer, load_stream
+
+
+class ListRSS:
+    '''Stand-in for FeedlyRSS, the same entries in every category'''
+    def __init__(self, entries):
+        self.entries = entries
+
+    def refresh(self):
+        pass
+
+    def iter_pages(self, categories, newer_than=None):
+        for category in categories:
+            yield category, self.entries
+
+
+def scrape_count():
+    return sum(h['count'] for (stage, _), h in METRICS.hists.items() if stage == 'scrape')
+
+
+def test_report_per_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with FixtureServer() as server:
+        entries = load_stream(server.url)[:5]
+        for k in range(2):
+            report = tmp_path / ('metrics%s.json'%k)
+            main.main(None, 'a', None, str(tmp_path / 'a'), cache_dir='None', store_dir='None',
+                      renderer='html', dedup=False, metrics=str(report), feedly_api=ListRSS(entries))
+            stages = json.loads(report.read_text(encoding='utf-8'))['stages']
+            assert sum(h['count'] for h in stages if h['stage'] == 'scrape') == len(entries)
+
+
+def test_shared_entries_scraped_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with FixtureServer() as server:
+        entries = load_stream(server.url)[:20]
+        before = scrape_count()
+        FETCHER.pages['%s/unused.html'%server.url] = '<html></html>'
+        main.main(None, ['a', 'b'], None, [str(tmp_path / 'a'), str(tmp_path / 'b')],
+                  cache_dir='None', store_dir='None', renderer='html', dedup=False, depth=2,
+                  feedly_api=ListRSS(entries))
+    assert scrape_count() - before == len(entries)
+    assert FETCHER.pages == {}
+    for name in ('a', 'b'):
+        assert (tmp_path / ('%s.html'%name)).read_text(encoding='utf-8').count('<h') > len(entries)
+
+
+@pytest.mark.parametrize('fail', [False, True])
+def test_failed_window_not_checkpointed(tmp_path, monkeypatch, fail):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, 'SEEN', str(tmp_path / 'seen.db'))
+    with FixtureServer() as server:
+        entries = [e for e in load_stream(server.url) if e['id'] in ('fixture/forbes', 'fixture/wiley')]
+        if fail:
+            FETCHER.pages[entries[1]['canonicalUrl']] = ''
+        main.main(None, 'cat@20240101', None, str(tmp_path / 'out'), cache_dir='None',
+                  store_dir='None', renderer='html', incremental=True, dedup=False,
+                  feedly_api=ListRSS(entries), retry_failed=True)
+    seen = SeenIndex(str(tmp_path / 'seen.db'))
+    try:
+        assert (seen.last_run('cat@20240101') is None) == fail
+        assert len(seen.seen_ids('cat@20240101')) == (0 if fail else 2)
+    finally:
+        seen.close()